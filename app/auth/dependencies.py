@@ -1,19 +1,38 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from jose import JWTError, jwt
+import jwt
+from jwt import InvalidTokenError
 from pydantic import ValidationError
 from datetime import datetime, timedelta
+from cachetools import TTLCache
+import hashlib
+import os
+import time
 
 from .security import (
-    SECRET_KEY, ALGORITHM, fake_users_db, User, TokenData,
+    SECRET_KEY, ALGORITHM, cached_users, TokenData,
     authenticate_user, create_access_token
 )
 
 # Definir el esquema OAuth2 para la autenticación con token
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Caché de tokens ya validados: sha256(token) -> (usuario, exp). Solo guarda tokens válidos
+# y cada entrada vive como máximo JWT_CACHE_TTL_SECONDS (o hasta el exp del token, lo que ocurra antes)
+JWT_CACHE_ENABLED = os.getenv("CACHE_JWT", "true").lower() == "true"
+JWT_CACHE_TTL_SECONDS = int(os.getenv("JWT_CACHE_TTL_SECONDS", "30"))
+_validated_tokens = TTLCache(maxsize=10000, ttl=JWT_CACHE_TTL_SECONDS)
+
 # Función para obtener el usuario actual a partir del token
 async def get_current_user(token: str = Depends(oauth2_scheme)):
+    token_key = hashlib.sha256(token.encode('utf-8')).digest()
+    cached = _validated_tokens.get(token_key) if JWT_CACHE_ENABLED else None
+    if cached is not None:
+        cached_user, expires_at = cached
+        if time.time() < expires_at:
+            return cached_user
+        _validated_tokens.pop(token_key, None)
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Credenciales inválidas",
@@ -21,22 +40,19 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     )
     try:
         # Decodificar el token JWT
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(
+            token, SECRET_KEY, algorithms=[ALGORITHM], options={"require": ["exp", "sub"]}
+        )
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
         token_data = TokenData(username=username)
-    except (JWTError, ValidationError):
+        expires_at = payload.get("exp")
+    except (InvalidTokenError, ValidationError):
         raise credentials_exception
 
     # Obtener el usuario de la "base de datos"
-    user = None
-    if token_data.username in fake_users_db:
-        user_dict = fake_users_db[token_data.username]
-        user = User(
-            username=user_dict["username"],
-            disabled=user_dict.get("disabled", False)
-        )
+    user = cached_users.get(token_data.username)
 
     if user is None:
         raise credentials_exception
@@ -47,10 +63,10 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
             detail="Usuario inactivo"
         )
 
+    if JWT_CACHE_ENABLED and expires_at is not None:
+        _validated_tokens[token_key] = (user, float(expires_at))
+
     return user
 
-# Función para obtener el usuario activo (adicional para verificar estado de usuario)
-async def get_current_active_user(current_user: User = Depends(get_current_user)):
-    if current_user.disabled:
-        raise HTTPException(status_code=400, detail="Usuario inactivo")
-    return current_user
+# Alias por compatibilidad: get_current_user ya rechaza usuarios inactivos
+get_current_active_user = get_current_user
@@ -1,11 +1,15 @@
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
-from datetime import datetime, timedelta
-from jose import JWTError, jwt
+from datetime import timedelta
+import jwt
 import os
+import time
 import json
-import base64
-from passlib.context import CryptContext
+import binascii
+import asyncio
+import hashlib
+import bcrypt
+from cachetools import TTLCache
 from dotenv import load_dotenv
 from fastapi import Request, HTTPException, status
 import logging
@@ -21,6 +25,10 @@ load_dotenv()
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "default_insecure_key")
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))
+_DEFAULT_EXPIRE_SECONDS = ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+# Costo de bcrypt (rondas), ajustable según el hardware
+BCRYPT_COST = int(os.getenv("BCRYPT_COST", "12"))
 
 # Modelo de usuario simplificado para autenticación interna
 class Token(BaseModel):
@@ -37,50 +45,79 @@ class User(BaseModel):
 class UserInDB(User):
     hashed_password: str
 
-# Configuración de hash de contraseña
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Caché de verificaciones exitosas (solo en memoria, nunca guarda la contraseña en claro)
+_verified_passwords = TTLCache(maxsize=1024, ttl=60)
+
+def _password_cache_key(plain_password, hashed_password):
+    return hashlib.blake2b(
+        plain_password.encode('utf-8') + b"\0" + hashed_password.encode('utf-8')
+    ).digest()
 
 # Función para verificar contraseñas
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# bcrypt es costoso en CPU, así que se ejecuta en un hilo para no bloquear el event loop
+async def verify_password(plain_password, hashed_password):
+    cache_key = _password_cache_key(plain_password, hashed_password)
+    if cache_key in _verified_passwords:
+        return True
+
+    verified = await asyncio.to_thread(
+        bcrypt.checkpw, plain_password.encode('utf-8'), hashed_password.encode('utf-8')
+    )
+    # Solo se cachean los aciertos para no convertir la caché en un oráculo de fuerza bruta
+    if verified:
+        _verified_passwords[cache_key] = True
+    return verified
 
 # Función para hash de contraseña
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_COST)).decode('utf-8')
 
 # Base de datos simulada para usuarios internos desde variables de entorno
 API_USERNAME = os.getenv("API_USERNAME", "admin")
 API_PASSWORD = os.getenv("API_PASSWORD", "insecure_default_password")
 
-fake_users_db = {
-    API_USERNAME: {
-        "username": API_USERNAME,
-        "hashed_password": get_password_hash(API_PASSWORD),
-        "disabled": False,
-    }
+# Registro del usuario interno: fuente única de la "base de datos" y de los modelos User
+_API_USER = {"username": API_USERNAME, "disabled": False}
+
+# El hash bcrypt de la contraseña se calcula recién en el primer uso para no
+# pagar su costo al importar el módulo (arranque, recargas en desarrollo), y en
+# un hilo para no bloquear el event loop durante el primer /token
+_fake_users_db: Optional[Dict[str, Dict[str, Any]]] = None
+_fake_users_db_lock = asyncio.Lock()
+
+async def get_fake_users_db():
+    global _fake_users_db
+    if _fake_users_db is None:
+        async with _fake_users_db_lock:
+            if _fake_users_db is None:
+                hashed_password = await asyncio.to_thread(get_password_hash, API_PASSWORD)
+                _fake_users_db = {API_USERNAME: {**_API_USER, "hashed_password": hashed_password}}
+    return _fake_users_db
+
+# Modelos User construidos una sola vez (la "base de datos" no cambia en tiempo de ejecución)
+cached_users = {
+    API_USERNAME: User(**_API_USER),
 }
 
+# Prefijo que identifica nuestro formato personalizado
+_CUSTOM_ENC_PREFIX = b"CUSTOM_ENC:"
+_CUSTOM_ENC_PREFIX_LEN = len(_CUSTOM_ENC_PREFIX)
+
 # Función para descifrar texto con formato personalizado simple
 def decrypt_custom_format(encrypted_text):
     try:
-        logger.info(f"Procesando formato personalizado: {encrypted_text[:15]}...")
+        encoded = encrypted_text.encode('ascii')
 
         # Verificar si tiene el prefijo que indica nuestro formato personalizado
-        if encrypted_text.startswith("CUSTOM_ENC:"):
-            # Extraer la parte codificada en base64
-            base64_part = encrypted_text[10:]  # Quitar "CUSTOM_ENC:"
-
-            # Decodificar de base64 a texto plano
-            plaintext = base64.b64decode(base64_part).decode('utf-8')
-
-            logger.info(f"Descifrado exitoso usando formato personalizado")
-            return plaintext
+        if encoded.startswith(_CUSTOM_ENC_PREFIX):
+            # Decodificar de base64 a texto plano la parte posterior al prefijo, sin copiarla
+            return binascii.a2b_base64(memoryview(encoded)[_CUSTOM_ENC_PREFIX_LEN:]).decode('utf-8')
         else:
             # Si no tiene el prefijo esperado, intentar otros métodos
             raise ValueError("No es un formato personalizado reconocido")
 
-    except Exception as e:
-        logger.error(f"Error al procesar formato personalizado: {str(e)}")
+    except (binascii.Error, ValueError) as e:
+        logger.error("Error al procesar formato personalizado: %s", e)
         raise
 
 # Función para obtener un usuario
@@ -91,20 +128,22 @@ def get_user(db, username: str):
     return None
 
 # Función para autenticar usuario
-def authenticate_user(fake_db, username: str, password: str):
+async def authenticate_user(fake_db, username: str, password: str):
     user = get_user(fake_db, username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password(password, user.hashed_password):
         return False
     return user
 
 # Función para autenticar usuario con credenciales procesadas
-def authenticate_user_processed(fake_db, form_data, request: Request):
+async def authenticate_user_processed(fake_db, form_data, request: Request):
     logger.info("Autenticando usuario con credenciales procesadas")
 
-    username = form_data.get('username', '')
-    encrypted_password = form_data.get('password', '')
+    # /token envía None para los campos ausentes, así que se normalizan a cadena vacía
+    get = form_data.get
+    username = get('username') or ''
+    encrypted_password = get('password') or ''
     password = ""
 
     # Verificar si es nuestro formato personalizado
@@ -112,9 +151,10 @@ def authenticate_user_processed(fake_db, form_data, request: Request):
         try:
             logger.info("Detectado formato personalizado")
             password = decrypt_custom_format(encrypted_password)
-            logger.info(f"Contraseña descifrada: {password[:2]}***")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Contraseña descifrada: %s***", password[:2])
         except Exception as e:
-            logger.error(f"Error al procesar formato personalizado: {str(e)}")
+            logger.error("Error al procesar formato personalizado: %s", e)
             # En caso de error, usar la contraseña sin procesar
             password = encrypted_password
     else:
@@ -123,26 +163,27 @@ def authenticate_user_processed(fake_db, form_data, request: Request):
         logger.info("Usando contraseña sin cifrar")
 
     # Autenticar con las credenciales procesadas
-    logger.info(f"Intentando autenticar usuario: {username}")
-    user = authenticate_user(fake_db, username, password)
+    logger.info("Intentando autenticar usuario: %s", username)
+    user = await authenticate_user(fake_db, username, password)
     if not user:
-        logger.warning(f"Autenticación fallida para el usuario: {username}")
+        logger.warning("Autenticación fallida para el usuario: %s", username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Credenciales incorrectas",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    logger.info(f"Usuario autenticado correctamente: {username}")
+    logger.info("Usuario autenticado correctamente: %s", username)
     return user
 
 # Función para crear un token de acceso
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
+    # El claim "exp" es un timestamp numérico (RFC 7519), se calcula directamente en segundos
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = int(time.time()) + int(expires_delta.total_seconds())
     else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+        expire = int(time.time()) + _DEFAULT_EXPIRE_SECONDS
+    to_encode["exp"] = expire
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
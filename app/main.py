@@ -1,23 +1,33 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints
 from fastapi import FastAPI, HTTPException, Request, Depends, status, Form, Header
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware import Middleware
-from .scraper import get_buildings
+from .scraper import get_buildings, close_shared_cache
+from .sources import BaseScraper, MendozaPropScraper, browser_pool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import Response
 from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
 import uvicorn
 import logging
-import requests
+import httpx
+import asyncio
+import hashlib
+import orjson
 import os
 import time
-from starlette.middleware.base import BaseHTTPMiddleware
-from collections import defaultdict
-from typing import Optional
+from starlette.responses import JSONResponse
+from slowapi import Limiter
+from slowapi.errors import RateLimitExceeded
+from slowapi.middleware import SlowAPIMiddleware
+from slowapi.util import get_remote_address
+from typing import Annotated, Optional
 
 # Importaciones para autenticación
 from .auth.security import (
     Token, User, authenticate_user, authenticate_user_processed, create_access_token,
-    ACCESS_TOKEN_EXPIRE_MINUTES, fake_users_db
+    ACCESS_TOKEN_EXPIRE_MINUTES, get_fake_users_db
 )
 from .auth.dependencies import get_current_active_user
 
@@ -25,64 +35,80 @@ from .auth.dependencies import get_current_active_user
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Implementación de rate limiting middleware
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, max_requests=100, window_seconds=60):
-        super().__init__(app)
-        self.max_requests = max_requests
-        self.window_seconds = window_seconds
-        self.request_counts = defaultdict(list)
-
-    async def dispatch(self, request, call_next):
-        # Obtener la IP del cliente
-        client_ip = request.client.host
-
-        # Limpiar entradas antiguas
-        current_time = time.time()
-        self.request_counts[client_ip] = [
-            timestamp for timestamp in self.request_counts[client_ip]
-            if timestamp > current_time - self.window_seconds
-        ]
-
-        # Verificar si el cliente excedió el límite
-        if len(self.request_counts[client_ip]) >= self.max_requests:
-            return self._rate_limit_response()
-
-        # Registrar la solicitud actual
-        self.request_counts[client_ip].append(current_time)
-
-        # Procesar la solicitud normalmente
-        response = await call_next(request)
-        return response
-
-    def _rate_limit_response(self):
-        from starlette.responses import JSONResponse
-        return JSONResponse(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            content={"detail": "Demasiadas solicitudes. Por favor, intente más tarde."}
-        )
+# Rate limiting con slowapi: el almacenamiento es configurable para que varios workers
+# (o varias instancias) compartan los contadores, por ejemplo con redis://host:6379
+RATE_LIMIT = os.getenv("RATE_LIMIT", "100/minute")
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", "memory://")
+
+# Detrás de un proxy o balanceador (Render, Railway, Fly.io) request.client.host es la IP del
+# proxy; con TRUST_PROXY_HEADERS=true se usa la IP informada en X-Forwarded-For. Cada proxy
+# agrega a la derecha la IP de quien le habló, y lo de la izquierda lo controla el cliente:
+# la IP real es la que está TRUSTED_PROXY_HOPS posiciones desde la derecha (1 si hay un solo proxy)
+TRUST_PROXY_HEADERS = os.getenv("TRUST_PROXY_HEADERS", "false").lower() == "true"
+TRUSTED_PROXY_HOPS = max(1, int(os.getenv("TRUSTED_PROXY_HOPS", "1")))
+
+def get_client_ip(request: Request) -> str:
+    if TRUST_PROXY_HEADERS:
+        forwarded_for = request.headers.get("x-forwarded-for")
+        if forwarded_for:
+            hops = [hop.strip() for hop in forwarded_for.split(",")]
+            if len(hops) >= TRUSTED_PROXY_HOPS and hops[-TRUSTED_PROXY_HOPS]:
+                return hops[-TRUSTED_PROXY_HOPS]
+    return get_remote_address(request)
+
+limiter = Limiter(
+    key_func=get_client_ip,
+    default_limits=[RATE_LIMIT],
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    strategy="moving-window",
+)
+
+async def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": "Demasiadas solicitudes. Por favor, intente más tarde."}
+    )
+
+# Cadena acotada para que la validación falle rápido ante valores desmedidos
+SearchField = Annotated[str, StringConstraints(max_length=64)]
 
 class BuildingSearchRequest(BaseModel):
-    source: str
-    province: str
-    cities: list[str]
-    property_type: str
+    # Inmutable (y por lo tanto hashable) y validado íntegramente por pydantic-core
+    model_config = ConfigDict(frozen=True, str_strip_whitespace=True)
+
+    source: SearchField
+    province: SearchField
+    cities: Annotated[tuple[SearchField, ...], Field(max_length=50)]
+    property_type: SearchField
+
+# Cerrar el cliente HTTP y el navegador compartidos por los scrapers al apagar la aplicación
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await BaseScraper.close_client()
+    await MendozaPropScraper.close_session()
+    await browser_pool.close()
+    await close_shared_cache()
 
 app = FastAPI(
     title="Alquileres Scraper API",
     description="API para obtener datos de alquileres de diferentes sitios web",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Agregar middleware de rate limiting
-app.add_middleware(
-    RateLimitMiddleware,
-    max_requests=100,  # Número máximo de solicitudes por ventana de tiempo
-    window_seconds=60  # Ventana de tiempo en segundos
-)
+app.state.limiter = limiter
+app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
+app.add_middleware(SlowAPIMiddleware)
 
 # Obtener orígenes permitidos desde variables de entorno o usar valores predeterminados seguros
-ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "http://localhost:5173,http://localhost:5174,http://127.0.0.1:5173,http://127.0.0.1:5174").split(",")
+# Se guardan en un frozenset para que la verificación del origen sea O(1) sin importar cuántos haya
+ALLOWED_ORIGINS = frozenset(
+    origin.strip()
+    for origin in os.getenv("ALLOWED_ORIGINS", "http://localhost:5173,http://localhost:5174,http://127.0.0.1:5173,http://127.0.0.1:5174").split(",")
+    if origin.strip()
+)
 
 # Configurar CORS para permitir peticiones solo desde orígenes específicos
 app.add_middleware(
@@ -91,8 +117,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "OPTIONS"],
     allow_headers=["Authorization", "Content-Type", "X-CSRF-Token"],
+    max_age=86400,  # Los navegadores cachean la respuesta del preflight (OPTIONS) durante un día
 )
 
+# Comprimir las respuestas grandes (los listados de propiedades en JSON se comprimen muy bien)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 @app.get("/")
 async def root():
     return {
@@ -111,9 +141,11 @@ async def login_for_access_token(
     Endpoint para autenticación y obtención de token JWT.
     Soporta autenticación estándar o con ofuscación básica.
     """
-    logger.info("Iniciando proceso de autenticación")
-    start_time = time.time()
-    logger.info(f"Datos de entrada: username={username}, password={password}")
+    # La medición de tiempos solo se hace si el nivel DEBUG está activo
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
+    if debug_enabled:
+        start_time = time.monotonic()
+
     # Crear un diccionario con los datos del formulario
     form_data = {
         "username": username,
@@ -121,30 +153,41 @@ async def login_for_access_token(
     }
 
     # Usar la función para autenticar con credenciales procesadas
-    user = authenticate_user_processed(fake_users_db, form_data, request)
+    user = await authenticate_user_processed(await get_fake_users_db(), form_data, request)
 
-    auth_time = time.time() - start_time
-    logger.info(f"Autenticación completada en {auth_time:.2f} segundos")
+    if debug_enabled:
+        auth_time = time.monotonic() - start_time
+        logger.debug("Autenticación completada en %.2f segundos", auth_time)
 
     # Crear token de acceso (JWT)
-    token_start = time.time()
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.username}, expires_delta=access_token_expires
     )
 
-    token_time = time.time() - token_start
-    total_time = time.time() - start_time
-    logger.info(f"Token generado en {token_time:.2f} segundos. Tiempo total: {total_time:.2f} segundos")
+    if debug_enabled:
+        total_time = time.monotonic() - start_time
+        logger.debug("Token generado. Tiempo total: %.2f segundos", total_time)
 
     return {"access_token": access_token, "token_type": "bearer"}
 
 # Endpoint para verificar el token y usuario actual
 @app.get("/users/me", response_model=User)
-async def read_users_me(current_user: User = Depends(get_current_active_user)):
+async def read_users_me(request: Request, response: Response, current_user: User = Depends(get_current_active_user)):
     """
     Endpoint para verificar la autenticación del usuario actual.
+    Incluye ETag para que el navegador reutilice la respuesta con un 304; con no-cache siempre
+    revalida, así que un token vencido o un cambio de usuario nunca se responde desde la caché.
     """
+    etag = '"' + hashlib.blake2b(
+        f"{current_user.username}:{current_user.disabled}".encode('utf-8'), digest_size=8
+    ).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response.headers.update(headers)
     return current_user
 
 @app.post("/api/properties/search")
@@ -158,55 +201,73 @@ async def search_properties(
     Aunque se usa POST por compatibilidad con navegadores, esta operación es solo de lectura.
     """
     try:
-        logger.info(f"Consulta recibida: source={request.source}, province={request.province}, cities={request.cities}, property_type={request.property_type}")
+        logger.info("Consulta recibida: source=%s, province=%s, cities=%s, property_type=%s", request.source, request.province, request.cities, request.property_type)
         buildings = await get_buildings(request=request)
-        logger.info(f"{len(buildings)} propiedades encontradas")
-        return buildings
+        logger.info("%s propiedades encontradas", len(buildings))
+        # Las filas son dataclasses que orjson serializa directamente, sin validarlas de nuevo
+        # con un response_model ni pasar por jsonable_encoder
+        return Response(content=orjson.dumps(buildings), media_type="application/json")
     except HTTPException as e:
         # Mantener la excepción HTTP ya formateada correctamente
-        logger.error(f"Error HTTP desde el scraper: {e.detail}")
+        logger.error("Error HTTP desde el scraper: %s", e.detail)
         raise
     except Exception as e:
         # Registrar el error completo pero no exponer detalles al cliente
-        logger.error(f"Error inesperado: {str(e)}", exc_info=True)
+        logger.error("Error inesperado: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error interno del servidor al procesar la solicitud"
         )
 
+# Caché en memoria de las zonas de Inmoup, ya serializadas a JSON
+ZONAS_CACHE_TTL_SECONDS = 300
+_zonas_cache = {"expires_at": 0.0, "data": None}
+_zonas_lock = asyncio.Lock()
+
 @app.get("/api/inmoup/zonas")
 async def get_inmoup_zonas(current_user: User = Depends(get_current_active_user)):
     """
-    Endpoint proxy para obtener las zonas desde Inmoup
+    Endpoint proxy para obtener las zonas desde Inmoup.
+    Las zonas casi no cambian, así que la respuesta se cachea durante ZONAS_CACHE_TTL_SECONDS
+    """
+    if time.monotonic() < _zonas_cache["expires_at"]:
+        return Response(content=_zonas_cache["data"], media_type="application/json")
+
+    # Solo una solicitud consulta Inmoup cuando la caché está vacía; el resto espera su resultado
+    async with _zonas_lock:
+        if time.monotonic() < _zonas_cache["expires_at"]:
+            return Response(content=_zonas_cache["data"], media_type="application/json")
+
+        zonas = await fetch_inmoup_zonas()
+        _zonas_cache["data"] = orjson.dumps(zonas)
+        _zonas_cache["expires_at"] = time.monotonic() + ZONAS_CACHE_TTL_SECONDS
+        return Response(content=_zonas_cache["data"], media_type="application/json")
+
+async def fetch_inmoup_zonas():
+    """
+    Consulta las zonas en Inmoup
     """
     try:
         # URL fija para evitar ataques SSRF
         inmoup_url = "https://www.inmoup.com.ar/zonas"
         params = {"pai_id": 1}
 
-        # Configurar tiempos de espera para evitar bloqueos
-        timeout_seconds = 10
-
-        # Hacer la petición con parámetros validados y timeout
-        response = requests.get(
-            inmoup_url,
-            params=params,
-            timeout=timeout_seconds,
-            headers={
-                "User-Agent": "AlquileresScraper/1.0"
-            }
-        )
+        # Hacer la petición con parámetros validados, reutilizando las conexiones del cliente compartido
+        http_client = await BaseScraper.client()
+        response = await http_client.get(inmoup_url, params=params)
 
         if response.status_code == 200:
             return response.json()
         else:
             # Registrar el error pero no mostrar detalles al cliente
-            logger.error(f"Error en petición a Inmoup: {response.status_code}")
+            logger.error("Error en petición a Inmoup: %s", response.status_code)
             raise HTTPException(
                 status_code=status.HTTP_502_BAD_GATEWAY,
                 detail="Error al obtener datos del servicio externo"
             )
-    except requests.Timeout:
+    except HTTPException:
+        raise
+    except httpx.TimeoutException:
         logger.error("Timeout en la petición a Inmoup")
         raise HTTPException(
             status_code=status.HTTP_504_GATEWAY_TIMEOUT,
@@ -214,7 +275,7 @@ async def get_inmoup_zonas(current_user: User = Depends(get_current_active_user)
         )
     except Exception as e:
         # Registrar el error pero no mostrar detalles al cliente
-        logger.error(f"Error al conectar con Inmoup: {str(e)}")
+        logger.error("Error al conectar con Inmoup: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error interno al procesar la solicitud"
@@ -225,4 +286,19 @@ async def health_check():
     return {"status": "ok"}
 
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="127.0.0.1", port=8000, reload=True)
+    if os.getenv("DEBUG", "False").lower() == "true":
+        # Desarrollo: recarga automática con un solo proceso
+        uvicorn.run("app.main:app", host="127.0.0.1", port=8000, reload=True)
+    else:
+        # Producción: event loop uvloop y parser HTTP httptools. Un solo worker por defecto: cada
+        # worker abre su propio Chromium (INMOUP_MAX_PARALLEL páginas) y, sin Redis, tiene sus
+        # propios contadores de rate limit y su propia caché de búsquedas
+        uvicorn.run(
+            "app.main:app",
+            host=os.getenv("API_HOST", "0.0.0.0"),
+            port=int(os.getenv("API_PORT", "8000")),
+            loop="uvloop",
+            http="httptools",
+            workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+            log_level="warning"
+        )
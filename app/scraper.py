@@ -1,7 +1,12 @@
+import asyncio
+import hashlib
 import logging
+import os
+import orjson
+from cachetools import TTLCache
 from fastapi import HTTPException
 from pydantic import BaseModel
-from typing import Dict, Type
+from typing import Any, Dict, Optional, Tuple, Type
 from .sources import BaseScraper, InmoupScraper, MendozaPropScraper
 
 # Configurar logging
@@ -20,10 +25,14 @@ class ScraperFactory:
         "mendozaprop": MendozaPropScraper
     }
 
+    # Instancias ya creadas: cada fuente usa un único scraper durante la vida del proceso
+    # para reutilizar sus recursos (cachés, conexiones) entre solicitudes
+    _instances: Dict[str, BaseScraper] = {}
+
     @classmethod
     def get_scraper(cls, source: str) -> BaseScraper:
         """
-        Obtiene una instancia del scraper adecuado según la fuente
+        Obtiene la instancia del scraper adecuado según la fuente, creándola en el primer uso
 
         Args:
             source: Nombre de la fuente (ej. "inmoup")
@@ -37,10 +46,13 @@ class ScraperFactory:
         source_lower = source.lower() if source else ""
 
         if source_lower in cls._scrapers:
-            # Crear y devolver una instancia del scraper correspondiente
-            return cls._scrapers[source_lower]()
+            # Reutilizar la instancia existente o crearla si es la primera vez
+            scraper = cls._instances.get(source_lower)
+            if scraper is None:
+                scraper = cls._instances[source_lower] = cls._scrapers[source_lower]()
+            return scraper
         else:
-            logger.error(f"Source no soportada: {source}")
+            logger.error("Source no soportada: %s", source)
             raise HTTPException(
                 status_code=400,
                 detail=f"Source no soportada: {source}"
@@ -56,11 +68,82 @@ class ScraperFactory:
             scraper_class: Clase del scraper que implementa BaseScraper
         """
         cls._scrapers[source_name.lower()] = scraper_class
+        # Descartar una instancia previa para que se cree con la nueva clase
+        cls._instances.pop(source_name.lower(), None)
+
+# Caché de resultados de búsqueda: las publicaciones cambian en minutos, no en segundos.
+# Guarda la tarea del scrape para que búsquedas idénticas concurrentes compartan una sola ejecución
+SEARCH_CACHE_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", "120"))
+_search_cache: TTLCache = TTLCache(maxsize=128, ttl=SEARCH_CACHE_TTL_SECONDS)
+
+def _search_cache_key(request: BaseModel) -> Tuple:
+    return (
+        (request.source or "").lower(),
+        request.province,
+        tuple(sorted(request.cities or ())),
+        request.property_type,
+    )
+
+# Segundo nivel de caché compartido entre workers y reinicios. Solo se usa si REDIS_URL está
+# definida; con timeouts cortos, un Redis colgado se trata como un fallo y no frena la búsqueda
+REDIS_URL = os.getenv("REDIS_URL")
+REDIS_TIMEOUT_SECONDS = float(os.getenv("REDIS_TIMEOUT_SECONDS", "0.5"))
+_redis: Optional[Any] = None
+
+def _get_redis():
+    """
+    Devuelve el cliente de Redis, creándolo en el primer uso (redis solo se importa si hace falta)
+    """
+    global _redis
+    if _redis is None and REDIS_URL:
+        import redis.asyncio as aioredis
+        _redis = aioredis.from_url(
+            REDIS_URL,
+            socket_timeout=REDIS_TIMEOUT_SECONDS,
+            socket_connect_timeout=REDIS_TIMEOUT_SECONDS,
+        )
+    return _redis
+
+def _redis_key(cache_key: Tuple) -> str:
+    return "search:" + hashlib.blake2b(repr(cache_key).encode(), digest_size=16).hexdigest()
+
+async def _scrape_with_shared_cache(scraper: BaseScraper, request: BaseModel, cache_key: Tuple):
+    """
+    Ejecuta el scrape consultando antes Redis. Un fallo de Redis no corta la búsqueda:
+    se registra y se scrapea igual. Las filas de Redis se reconstruyen como row_type del
+    scraper, así el resultado tiene el mismo tipo venga de donde venga
+    """
+    redis = _get_redis()
+    if redis is None:
+        return await scraper.get_buildings(request)
+
+    key = _redis_key(cache_key)
+    try:
+        cached = await redis.get(key)
+        if cached is not None:
+            logger.info("Usando resultados de Redis para la búsqueda")
+            return [scraper.row_type(**row) for row in orjson.loads(cached)]
+    except Exception as e:
+        logger.warning("Error leyendo la caché de Redis: %s", e)
+
+    buildings = await scraper.get_buildings(request)
+    try:
+        await redis.set(key, orjson.dumps(buildings), ex=SEARCH_CACHE_TTL_SECONDS)
+    except Exception as e:
+        logger.warning("Error guardando en la caché de Redis: %s", e)
+    return buildings
+
+async def close_shared_cache() -> None:
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
 
 # Función principal que recibe el request completo y usa el factory para obtener el scraper adecuado
 async def get_buildings(request: BaseModel):
     """
-    Obtiene edificios basados en los parámetros de request usando inversión de dependencia
+    Obtiene edificios basados en los parámetros de request usando inversión de dependencia.
+    Los resultados se cachean durante SEARCH_CACHE_TTL_SECONDS por combinación de filtros
 
     Args:
         request: Objeto BuildingSearchRequest con source, province, cities y property_type
@@ -68,10 +151,31 @@ async def get_buildings(request: BaseModel):
     Returns:
         Lista de propiedades encontradas
     """
-    logger.info(f"Buscando propiedades con: {request}")
+    logger.info("Buscando propiedades con: %s", request)
+
+    cache_key = _search_cache_key(request)
+    task = _search_cache.get(cache_key)
+
+    if task is None:
+        # Obtener el scraper apropiado usando el factory
+        scraper = ScraperFactory.get_scraper(request.source)
+
+        # Usar el scraper para obtener los edificios en una tarea compartida
+        task = asyncio.ensure_future(_scrape_with_shared_cache(scraper, request, cache_key))
+        _search_cache[cache_key] = task
+        task.add_done_callback(lambda t: _on_search_done(cache_key, t))
+    else:
+        logger.info("Usando resultados en caché para la búsqueda")
 
-    # Obtener el scraper apropiado usando el factory
-    scraper = ScraperFactory.get_scraper(request.source)
+    # shield evita que la cancelación de un cliente cancele el scrape que comparten los demás
+    return await asyncio.shield(task)
 
-    # Usar el scraper para obtener los edificios
-    return await scraper.get_buildings(request)
+def _on_search_done(cache_key: Tuple, task: asyncio.Future) -> None:
+    if _search_cache.get(cache_key) is not task:
+        return
+    if task.cancelled() or task.exception() is not None:
+        # No cachear errores: la próxima búsqueda vuelve a intentar
+        del _search_cache[cache_key]
+    else:
+        # Reinsertar para que el TTL cuente desde que el resultado está disponible
+        _search_cache[cache_key] = task
@@ -1,3 +1,3 @@
 from .base_scraper import BaseScraper
-from .inmoup import InmoupScraper, get_buildings_inmoup
+from .inmoup import InmoupScraper, get_buildings_inmoup, browser_pool
 from .mendozaprop import MendozaPropScraper, get_buildings_mendozaprop
@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
+import asyncio
 import logging
-from typing import List, Dict, Any
+from typing import ClassVar, List, Any, Optional
+import httpx
 from pydantic import BaseModel
 
 # Configurar logging
@@ -11,8 +13,47 @@ class BaseScraper(ABC):
     Clase base abstracta que define la interfaz para todos los scrapers de propiedades
     """
 
+    # Tipo de fila que devuelve get_buildings: una dataclass con slots que orjson serializa
+    # directamente. Permite reconstruir las filas guardadas como JSON (por ejemplo, en Redis)
+    row_type: ClassVar[type]
+
+    # Cliente HTTP compartido por todos los scrapers (y los proxys de la API) para
+    # reutilizar conexiones keep-alive/HTTP2 entre solicitudes
+    _client: ClassVar[Optional[httpx.AsyncClient]] = None
+    _client_lock: ClassVar[asyncio.Lock] = asyncio.Lock()
+
+    @classmethod
+    async def client(cls) -> httpx.AsyncClient:
+        """
+        Devuelve el cliente HTTP compartido, creándolo en el primer uso
+
+        Returns:
+            Instancia compartida de httpx.AsyncClient
+        """
+        if BaseScraper._client is None:
+            async with BaseScraper._client_lock:
+                if BaseScraper._client is None:
+                    BaseScraper._client = httpx.AsyncClient(
+                        http2=True,
+                        timeout=10,
+                        # Las búsquedas llegan espaciadas: mantener las conexiones inactivas 60 s
+                        # (el default de httpx es 5 s) evita repetir el handshake TLS entre una y otra
+                        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=60),
+                        headers={"User-Agent": "AlquileresScraper/1.0"}
+                    )
+        return BaseScraper._client
+
+    @classmethod
+    async def close_client(cls) -> None:
+        """
+        Cierra el cliente HTTP compartido (al apagar la aplicación)
+        """
+        if BaseScraper._client is not None:
+            await BaseScraper._client.aclose()
+            BaseScraper._client = None
+
     @abstractmethod
-    async def get_buildings(self, request: BaseModel) -> List[Dict[str, Any]]:
+    async def get_buildings(self, request: BaseModel) -> List[Any]:
         """
         Método abstracto que debe ser implementado por las clases concretas
         para obtener propiedades de una fuente específica
@@ -21,6 +62,6 @@ class BaseScraper(ABC):
             request: Objeto con los parámetros de búsqueda
 
         Returns:
-            Lista de propiedades encontradas
+            Lista de propiedades encontradas, instancias de row_type
         """
         pass
@@ -1,23 +1,367 @@
-from playwright.async_api import async_playwright
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 import logging
 from fastapi import HTTPException
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Union
 from .base_scraper import BaseScraper
 import asyncio
-import json
+import functools
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
 import re
+import orjson
 import os
-from bs4 import BeautifulSoup
+import tempfile
+import time
+import httpx
+from urllib.parse import urljoin
+from selectolax.lexbor import LexborHTMLParser
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+# Cabeceras de navegador para la descarga directa del listado
+_BROWSER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml",
+    "Accept-Language": "es-AR,es;q=0.9",
+}
+
+# Partes fijas de la URL del listado
+_BASE_URL = "https://inmoup.com.ar/"
+_URL_QUERY_PREFIX = "favoritos=0&limit=10000&prevEstadoMap=&ordenar=recientes"
+_URL_SUFFIX = "&lastZoom=13&precio%5Bmin%5D=&precio%5Bmax%5D=&moneda=1&sup_cubierta%5Bmin%5D=&sup_cubierta%5Bmax%5D=&sup_total%5Bmin%5D=&sup_total%5Bmax%5D=&recientes=mes"
+# Localidades por defecto si no se especifican ciudades
+_DEFAULT_CITIES = "1%2C2%2C7%2C19"
+_DEPART_RE = re.compile(r"depart", re.I)
+
+@functools.lru_cache(maxsize=256)
+def _listing_url(property_type: Optional[str], cities: Union[str, Tuple[Any, ...], None]) -> str:
+    """
+    URL del listado para un tipo de propiedad y unas localidades. Es función pura de sus
+    argumentos, así que se memoriza
+    """
+    # Determinar tipo de propiedad para la URL
+    prop_type = "casas-en-alquiler"
+    if property_type and _DEPART_RE.search(property_type):
+        prop_type = "departamentos-en-alquiler"
+
+    # Añadir localidades si están especificadas; si no, las de por defecto
+    if cities:
+        # Puede venir como cadena "2,1,8" o como lista de IDs; en ambos casos se separan con %2C
+        if isinstance(cities, str):
+            formatted_ids = cities.replace(',', '%2C')
+        else:
+            formatted_ids = '%2C'.join(map(str, cities))
+    else:
+        formatted_ids = _DEFAULT_CITIES
+
+    return f"{_BASE_URL}{prop_type}?{_URL_QUERY_PREFIX}&localidades={formatted_ids}{_URL_SUFFIX}"
+
+# Selectores CSS de los datos de cada artículo, compartidos por todas las búsquedas
+_SEL_ARTICLE = 'article'
+_SEL_PROPDATA = 'div.property-data'
+_SEL_IMG = 'img'
+_SEL_LINK = 'a.cont-photo'
+
+# Script que extrae en el navegador los datos de todos los artículos de una vez
+# (se ejecuta con locator.evaluate_all, que recibe la lista de nodos)
+_EXTRACT_ARTICLES_JS = f"""nodes => nodes.map(el => {{
+    // Una sola pasada por la lista de atributos del artículo en vez de un getAttribute por campo
+    const a = {{}};
+    for (const {{name, value}} of el.attributes) a[name] = value;
+    // Misma normalización que InmoupScraper._fix_image_url (URLs absolutas, relativas o
+    // sin protocolo resueltas contra el sitio), así la URL llega ya absoluta
+    const absUrl = u => {{
+        if (!u) return '';
+        try {{ return new URL(u, '{_BASE_URL}').href; }} catch (e) {{ return ''; }}
+    }};
+    // Un solo recorrido del artículo para los tres selectores; se queda con el primero de cada uno
+    let dir = null, img = null, link = null;
+    for (const node of el.querySelectorAll('{_SEL_PROPDATA}, {_SEL_IMG}, {_SEL_LINK}')) {{
+        if (!dir && node.matches('{_SEL_PROPDATA}')) dir = node;
+        else if (!img && node.matches('{_SEL_IMG}')) img = node;
+        else if (!link && node.matches('{_SEL_LINK}')) link = node;
+    }}
+    return {{
+        precio: a.precio || '',
+        kid: a.kid || '',
+        lat: a.lat || '',
+        lng: a.lng || '',
+        hasgeolocation: a.hasgeolocation || '',
+        sup_t: a.sup_t || '',
+        sup_c: a.sup_c || '',
+        ser_1: a.ser_1 || '',
+        ser_2: a.ser_2 || '',
+        ser_3: a.ser_3 || '',
+        // Espacios colapsados, igual que el respaldo con selectolax
+        direccion: dir ? dir.innerText.replace(/\\s+/g, ' ').trim() : '',
+        image: img ? absUrl(img.getAttribute('src')) : '',
+        href: link ? (link.getAttribute('href') || '') : ''
+    }};
+}})"""
+
+@dataclass(slots=True)
+class InmoupBuilding:
+    """
+    Propiedad obtenida de Inmoup. Con slots ocupa menos memoria que un dict por fila y
+    orjson la serializa directamente
+    """
+    price: Any
+    direccion: str
+    image: str
+    additional_images: Sequence[str]
+    habitaciones: str
+    supTotal: str
+    supCub: str
+    garage: Union[bool, str]
+    banos: str
+    url: str
+    kid: str
+    hasgeolocation: str
+    latitude: str
+    longitude: str
+    source: str = "inmoup"
+
+# Script que devuelve window.rdb_properties serializado, o null si la página no lo trae
+_RDB_PROPERTIES_JS = """() => {
+    if (window.rdb_properties && Array.isArray(window.rdb_properties)) {
+        return JSON.stringify(window.rdb_properties);
+    }
+    return null;
+}"""
+
+# Condición de datos listos en la página: el JSON de propiedades o, con el documento ya
+# parseado (todos los scripts síncronos ejecutados), al menos un artículo
+_DATA_READY_JS = f"""() => Array.isArray(window.rdb_properties)
+    || (document.readyState !== 'loading' && document.querySelector('{_SEL_ARTICLE}') !== null)"""
+
+# Comienzo del literal de window.rdb_properties dentro del HTML del listado
+_RDB_PROPERTIES_RE = re.compile(rb'window\.rdb_properties\s*=\s*\[')
+
+_RDB_PROPERTIES_MARKER = b"window.rdb_properties"
+
+# Tokens que importan para encontrar el cierre del arreglo: una cadena JSON completa (el motor
+# de regex la saltea entera, con sus escapes; si el grupo final no matchea, la cadena sigue en
+# el próximo fragmento) o un corchete fuera de cadenas
+_JSON_SCAN_RE = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*(")?|[\[\]]', re.S)
+
+def _decode_rdb_properties(raw: bytes) -> Optional[list]:
+    """
+    Decodifica el literal de window.rdb_properties, o None si no es un arreglo JSON válido
+    """
+    try:
+        data = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return None
+    return data if isinstance(data, list) else None
+
+async def _read_until_rdb_properties(response: httpx.Response):
+    """
+    Lee el cuerpo de la respuesta por partes y corta apenas llega el literal completo de
+    window.rdb_properties, sin decodificar el HTML a str ni descargar el resto de la página.
+    El cierre del arreglo se encuentra siguiendo la profundidad de corchetes fuera de las
+    cadenas, fragmento a fragmento, y el JSON se decodifica una sola vez. Si no decodifica, se
+    lee el cuerpo completo para el fallback con selectolax
+
+    Returns:
+        Tupla (bytes leídos, lista de window.rdb_properties o None si la página no la trae)
+    """
+    buf = bytearray()
+    start = -1
+    array_start = -1
+    scan_pos = 0
+    depth = 0
+    async for chunk in response.aiter_bytes():
+        scanned = len(buf)
+        buf += chunk
+        if start < 0:
+            # El marcador puede quedar partido entre dos fragmentos
+            start = buf.find(_RDB_PROPERTIES_MARKER, max(0, scanned - len(_RDB_PROPERTIES_MARKER)))
+            if start < 0:
+                continue
+        if array_start < 0:
+            match = _RDB_PROPERTIES_RE.match(buf, start)
+            # Un marcador que no va seguido de "= [" (por ejemplo, una lectura de la variable)
+            # se saltea y se busca el siguiente
+            while match is None and start >= 0 and len(buf) - start > 64:
+                start = buf.find(_RDB_PROPERTIES_MARKER, start + 1)
+                match = _RDB_PROPERTIES_RE.match(buf, start) if start >= 0 else None
+            if match is None:
+                continue
+            array_start = scan_pos = match.end() - 1
+        if scan_pos < 0:
+            # El literal no decodificó: solo resta leer el cuerpo completo
+            continue
+        # Continuar el recorrido donde quedó el fragmento anterior
+        token = _JSON_SCAN_RE.search(buf, scan_pos)
+        while token is not None:
+            char = buf[token.start()]
+            if char == 0x22 and token.group(1) is None:  # '"' sin cierre
+                # Cadena incompleta: se retoma desde su comienzo con el próximo fragmento
+                scan_pos = token.start()
+                break
+            scan_pos = token.end()
+            if char != 0x22:
+                depth += 1 if char == 0x5B else -1  # '[' o ']'
+                if depth == 0:
+                    # Decodificar varios cientos de KB es trabajo de CPU: se hace en un hilo
+                    properties_data = await asyncio.to_thread(
+                        _decode_rdb_properties, bytes(buf[array_start:scan_pos])
+                    )
+                    if properties_data is not None:
+                        return buf, properties_data
+                    logger.warning("No se pudo decodificar rdb_properties del HTML")
+                    scan_pos = -1
+                    break
+            token = _JSON_SCAN_RE.search(buf, scan_pos)
+        else:
+            scan_pos = len(buf)
+    return buf, None
+
+# Recursos que no hacen falta para leer los datos del listado. Los scripts propios del sitio
+# sí se cargan porque definen window.rdb_properties
+_BLOCKED_RESOURCE_TYPES = frozenset({"image", "stylesheet", "font", "media", "websocket"})
+_BLOCKED_HOSTS = ("google-analytics", "googletagmanager", "doubleclick", "facebook")
+
+async def _block_unneeded_resources(route):
+    request = route.request
+    if request.resource_type in _BLOCKED_RESOURCE_TYPES or any(host in request.url for host in _BLOCKED_HOSTS):
+        await route.abort()
+    else:
+        await route.continue_()
+
+# Estado del navegador (cookies y localStorage) persistido entre reinicios del proceso
+INMOUP_STORAGE_STATE_PATH = os.getenv(
+    "INMOUP_STORAGE_STATE_PATH", os.path.join(tempfile.gettempdir(), "inmoup_state.json")
+)
+STORAGE_STATE_MAX_AGE = 3600
+STORAGE_STATE_SAVE_INTERVAL = 300
+
+def _load_storage_state() -> Optional[str]:
+    """Devuelve la ruta del estado guardado si existe y tiene menos de una hora"""
+    try:
+        if time.time() - os.path.getmtime(INMOUP_STORAGE_STATE_PATH) < STORAGE_STATE_MAX_AGE:
+            return INMOUP_STORAGE_STATE_PATH
+    except OSError:
+        pass
+    return None
+
+def _write_storage_state(state: Dict[str, Any]) -> None:
+    # Escritura atómica: un proceso que lee nunca ve el archivo a medio escribir
+    tmp_path = f"{INMOUP_STORAGE_STATE_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(state))
+    os.replace(tmp_path, INMOUP_STORAGE_STATE_PATH)
+
+# Opciones de lanzamiento de Chromium; en Render.com se usa un enfoque diferente
+_IN_RENDER = os.environ.get('RENDER', 'false').lower() == 'true'
+if _IN_RENDER:
+    _LAUNCH_ARGS = {
+        'headless': True,
+        'args': ['--no-sandbox', '--disable-setuid-sandbox', '--disable-dev-shm-usage', '--disable-accelerated-2d-canvas', '--disable-gpu']
+    }
+else:
+    _LAUNCH_ARGS = {
+        'headless': True,
+        'args': ['--disable-gpu', '--no-sandbox', '--disable-dev-shm-usage']
+    }
+
+# Opciones del contexto compartido: viewport chico y sin escalado para abaratar el layout,
+# y sin service workers. JavaScript queda habilitado porque window.rdb_properties lo define un script del sitio
+_CONTEXT_OPTIONS = {
+    'viewport': {'width': 640, 'height': 480},
+    'device_scale_factor': 1,
+    # Mismo User-Agent que la descarga HTTP directa, para que ambas vean la misma página
+    'user_agent': _BROWSER_HEADERS['User-Agent'],
+    'java_script_enabled': True,
+    'service_workers': 'block',
+}
+
+class _BrowserPool:
+    """
+    Mantiene un único navegador Chromium por proceso, lanzado en el primer uso, con un
+    contexto de larga vida del que sale una página nueva por cada scrape. Reutilizar el
+    contexto conserva la conexión HTTP/2 con inmoup.com.ar y evita repetir el handshake TLS.
+    Un semáforo limita cuántas páginas hay abiertas a la vez
+    """
+
+    def __init__(self, max_pages: int):
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(max_pages)
+        self._state_saved_at = 0.0
+
+    async def _get_context(self):
+        if self._browser is None or not self._browser.is_connected():
+            async with self._lock:
+                if self._browser is None or not self._browser.is_connected():
+                    if self._playwright is None:
+                        self._playwright = await async_playwright().start()
+                    logger.info("Lanzando navegador Chromium compartido")
+                    if _IN_RENDER:
+                        logger.info("Usando navegador para Render.com")
+                    self._browser = await self._playwright.chromium.launch(**_LAUNCH_ARGS)
+                    # Las cookies guardadas evitan repetir el desafío anti-bots del sitio tras un reinicio.
+                    # El bloqueo de recursos se registra una sola vez en el contexto compartido
+                    try:
+                        self._context = await self._browser.new_context(
+                            storage_state=_load_storage_state(), **_CONTEXT_OPTIONS
+                        )
+                    except Exception as e:
+                        logger.warning("Estado del navegador guardado inválido, se descarta: %s", e)
+                        self._context = await self._browser.new_context(**_CONTEXT_OPTIONS)
+                    await self._context.route("**/*", _block_unneeded_resources)
+        return self._context
+
+    @asynccontextmanager
+    async def page(self):
+        async with self._semaphore:
+            context = await self._get_context()
+            page = await context.new_page()
+            try:
+                yield page
+            finally:
+                await page.close()
+
+    async def save_storage_state(self) -> None:
+        """
+        Guarda en disco las cookies y el localStorage del contexto compartido, como mucho
+        una vez cada STORAGE_STATE_SAVE_INTERVAL segundos
+        """
+        now = time.monotonic()
+        if self._context is None or now - self._state_saved_at < STORAGE_STATE_SAVE_INTERVAL:
+            return
+        self._state_saved_at = now
+        try:
+            state = await self._context.storage_state()
+            await asyncio.to_thread(_write_storage_state, state)
+        except Exception as e:
+            logger.warning("No se pudo guardar el estado del navegador: %s", e)
+
+    async def close(self) -> None:
+        self._context = None
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+# Máximo de páginas de Playwright abiertas a la vez; las demás búsquedas esperan su turno
+INMOUP_MAX_PARALLEL = int(os.getenv("INMOUP_MAX_PARALLEL", str((os.cpu_count() or 1) * 2)))
+
+browser_pool = _BrowserPool(max_pages=INMOUP_MAX_PARALLEL)
+
 class InmoupScraper(BaseScraper):
     """
     Scraper específico para el sitio Inmoup
     """
 
+    row_type = InmoupBuilding
+
     def _fix_image_url(self, image_url: str) -> str:
         """
         Convierte URLs relativas de imágenes a URLs absolutas.
@@ -31,14 +375,101 @@ class InmoupScraper(BaseScraper):
         if not image_url:
             return ""
 
-        # Si ya es una URL absoluta, devolverla como está
-        if image_url.startswith(('http://', 'https://')):
-            return image_url
+        # urljoin deja intactas las URLs absolutas y resuelve las relativas y las que no
+        # tienen protocolo (//host/...) contra el dominio de Inmoup
+        return urljoin(_BASE_URL, image_url)
+
+    def _map_rdb_property(self, prop: Dict[str, Any]) -> Optional[InmoupBuilding]:
+        """
+        Convierte una propiedad de window.rdb_properties al formato común, o None si viene
+        con un formato inesperado
+        """
+        try:
+            get = prop.get
+            lat = get('lat', '')
+            lng = get('lng', '')
+            return InmoupBuilding(
+                price=get('precio', ''),
+                direccion=f"{get('calle', '')}, {get('localidad', '')}",
+                # Imagen principal como URL absoluta
+                image=self._fix_image_url(get('foto_portada', '')),
+                additional_images=(),  # Sin imágenes adicionales
+                habitaciones=str(get('cant_habitaciones', '')),
+                supTotal=str(get('sup_total', '')),
+                supCub=str(get('sup_cubierta', '')),
+                garage=bool(get('garage', False)),
+                banos=str(get('cant_banos', '')),
+                url=urljoin(_BASE_URL, get('url', '')),
+                kid=str(get('id', '')),
+                hasgeolocation="true" if lat and lng else "false",
+                latitude=str(lat),
+                longitude=str(lng),
+            )
+        except Exception as e:
+            logger.error("Error procesando propiedad JSON: %s", e)
+            return None
+
+    def _props_to_buildings(self, properties_data: List[Dict[str, Any]]) -> List[InmoupBuilding]:
+        """
+        Convierte las propiedades de window.rdb_properties al formato común. La usan tanto
+        la descarga HTTP como Playwright
+        """
+        return [b for b in map(self._map_rdb_property, properties_data) if b is not None]
 
-        # Si es una ruta relativa, añadir el dominio base de Inmoup
-        return f"https://inmoup.com.ar{image_url}"
+    def _map_article_node(self, node) -> Optional[InmoupBuilding]:
+        """
+        Convierte un <article> parseado con selectolax al formato común, o None si falla
+        """
+        try:
+            attrs = node.attributes
+            dir_node = node.css_first(_SEL_PROPDATA)
+            # Espacios colapsados, igual que el innerText normalizado del camino con Playwright,
+            # para que la misma publicación tenga la misma dirección venga por donde venga
+            direccion = " ".join(dir_node.text(separator=" ", strip=True).split()) if dir_node is not None else ""
+            img_node = node.css_first(_SEL_IMG)
+            image_rel = (img_node.attributes.get('src') or "") if img_node is not None else ""
+            link_node = node.css_first(_SEL_LINK)
+            href = (link_node.attributes.get('href') or "") if link_node is not None else ""
+
+            return InmoupBuilding(
+                price=attrs.get('precio') or "",
+                direccion=direccion,
+                image=self._fix_image_url(image_rel),
+                additional_images=(),  # Sin imágenes adicionales
+                habitaciones=attrs.get('ser_1') or "",
+                supTotal=attrs.get('sup_t') or "",
+                supCub=attrs.get('sup_c') or "",
+                garage=attrs.get('ser_3') or "",
+                banos=attrs.get('ser_2') or "",
+                url=urljoin(_BASE_URL, href),
+                kid=attrs.get('kid') or "",
+                hasgeolocation=attrs.get('hasgeolocation') or "",
+                latitude=attrs.get('lat') or "",
+                longitude=attrs.get('lng') or "",
+            )
+        except Exception as e:
+            logger.error("Error procesando propiedad: %s", e)
+            return None
 
-    async def get_buildings(self, request: BaseModel) -> List[Dict[str, Any]]:
+    def _build_url(self, request: Optional[BaseModel]) -> str:
+        """
+        Construye la URL del listado de Inmoup según los filtros de búsqueda
+
+        Args:
+            request: Objeto BuildingSearchRequest con los parámetros de búsqueda
+
+        Returns:
+            URL del listado
+        """
+        if not request:
+            return _listing_url(None, None)
+        cities = request.cities
+        # Las listas no son hasheables; el resto (tupla o cadena) se usa tal cual como clave
+        if isinstance(cities, list):
+            cities = tuple(cities)
+        return _listing_url(request.property_type, cities)
+
+    async def get_buildings(self, request: BaseModel) -> List[InmoupBuilding]:
         """
         Implementación del método para obtener propiedades de Inmoup
 
@@ -49,198 +480,184 @@ class InmoupScraper(BaseScraper):
             Lista de propiedades encontradas
         """
         try:
-            # Usamos Playwright para obtener los datos de las propiedades
+            # Primero intentamos con una petición HTTP simple: el listado viene renderizado
+            # en el servidor y evita lanzar un navegador
+            # None indica que el HTML no trajo datos; una lista vacía es un resultado válido
+            buildings = await self._get_buildings_httpx(request)
+            if buildings is not None:
+                return buildings
+
+            # Si no hubo datos en el HTML, usamos Playwright para obtener los datos de las propiedades
+            logger.info("Sin artículos en el HTML de Inmoup, usando Playwright")
             return await self._get_buildings_playwright(request)
         except Exception as e:
-            logger.error(f"Error general en el scraper de Inmoup: {str(e)}")
+            logger.error("Error general en el scraper de Inmoup: %s", e)
             raise HTTPException(
                 status_code=500,
                 detail="Error interno del servidor al procesar datos de inmuebles de Inmoup"
             )
 
-    async def _get_buildings_playwright(self, request: Optional[BaseModel]) -> List[Dict[str, Any]]:
+    async def _get_buildings_httpx(self, request: Optional[BaseModel]) -> Optional[List[InmoupBuilding]]:
+        """
+        Obtiene las propiedades descargando el HTML del listado, sin navegador. Usa el JSON
+        de window.rdb_properties si viene en la página y, si no, lee los atributos de cada
+        <article> con selectolax
+
+        Returns:
+            Lista de propiedades encontradas (vacía si la búsqueda no tiene resultados), o None
+            si la petición falla o el HTML no trae ni window.rdb_properties ni artículos
+        """
+        url = self._build_url(request)
+        logger.info("Consultando listado de Inmoup por HTTP: %s", url)
+
+        try:
+            client = await self.client()
+            async with client.stream("GET", url, headers=_BROWSER_HEADERS, timeout=30, follow_redirects=True) as response:
+                if response.status_code != 200:
+                    logger.warning("Inmoup respondió %s a la petición HTTP", response.status_code)
+                    return None
+                content, properties_data = await _read_until_rdb_properties(response)
+                encoding = response.encoding or "utf-8"
+        except httpx.HTTPError as e:
+            logger.warning("Error en la petición HTTP a Inmoup: %s", e)
+            return None
+
+        # Decodificar y recorrer varios MB es trabajo de CPU: se hace en un hilo para no
+        # frenar el event loop mientras tanto
+        return await asyncio.to_thread(self._parse_listing, content, properties_data, encoding)
+
+    def _parse_listing(self, content: bytearray, properties_data: Optional[list], encoding: str) -> Optional[List[InmoupBuilding]]:
+        """
+        Convierte la respuesta HTTP del listado en propiedades (síncrono, corre fuera del event loop)
+
+        Returns:
+            Lista de propiedades encontradas, o None si el HTML no trae datos
+        """
+        # Si la página trae window.rdb_properties, el JSON ya tiene todos los datos y no hace
+        # falta recorrer el HTML; un arreglo vacío significa que la búsqueda no tiene resultados
+        if properties_data is not None:
+            buildings = self._props_to_buildings(properties_data)
+            logger.info("Se encontraron %s propiedades en JSON por HTTP", len(buildings))
+            return buildings
+
+        if b"<article" not in content:
+            return None
+
+        html = content.decode(encoding, errors="replace")
+        nodes = LexborHTMLParser(html).css(_SEL_ARTICLE)
+        if not nodes:
+            return None
+        buildings = [b for b in map(self._map_article_node, nodes) if b is not None]
+
+        logger.info("Se encontraron %s propiedades por HTTP", len(buildings))
+        return buildings
+
+    async def _get_buildings_playwright(self, request: Optional[BaseModel]) -> List[InmoupBuilding]:
         """
         Implementación del método para obtener propiedades de Inmoup usando Playwright
         """
         try:
-            async with async_playwright() as p:
-                # Configuración adaptada para entornos como Render
-                browser_type = p.chromium
-                browser_launch_args = {
-                    'headless': True,
-                    'args': ['--disable-gpu', '--no-sandbox', '--disable-dev-shm-usage']
-                }
-
-                # Verificar si estamos en Render.com y usar un enfoque diferente
-                in_render = os.environ.get('RENDER', 'false').lower() == 'true'
-                if in_render:
-                    # En Render, podemos usar Chrome en lugar de instalar Chromium
-                    logger.info("Usando navegador para Render.com")
-                    browser_type = p.chromium
-                    browser_launch_args = {
-                        'headless': True,
-                        'args': ['--no-sandbox', '--disable-setuid-sandbox', '--disable-dev-shm-usage', '--disable-accelerated-2d-canvas', '--disable-gpu']
-                    }
-
-                # Lanzar el navegador con la configuración adaptada
-                browser = await browser_type.launch(**browser_launch_args)
-
-                page = await browser.new_page()
-
-                # Construir URL basada en los filtros proporcionados
-                base_url = "https://inmoup.com.ar/"
-
-                # Determinar tipo de propiedad para la URL
-                prop_type = "casas-en-alquiler"
-                if request and request.property_type and "depart" in request.property_type.lower():
-                    prop_type = "departamentos-en-alquiler"
-
-                url = f"{base_url}{prop_type}?favoritos=0&limit=10000&prevEstadoMap=&ordenar=recientes"
-
-                # Añadir localidades si están especificadas
-                if request and request.cities and len(request.cities) > 0:
-                    # Convertir la lista de IDs de ciudades a formato de URL
-                    city_ids = request.cities
-                    # Si city_ids ya viene como una cadena con el formato "2,1,8", usarla directamente
-                    if isinstance(city_ids, str):
-                        # Reemplazamos las comas con %2C para la codificación URL
-                        formatted_ids = city_ids.replace(',', '%2C')
-                        url += f"&localidades={formatted_ids}"
-                    else:
-                        # Si es una lista, la unimos con %2C
-                        formatted_ids = '%2C'.join(str(city_id) for city_id in city_ids)
-                        url += f"&localidades={formatted_ids}"
-                else:
-                    # Valores por defecto si no se especifican ciudades
-                    url += "&localidades=1%2C2%2C7%2C19"
-
-                url += "&lastZoom=13&precio%5Bmin%5D=&precio%5Bmax%5D=&moneda=1&sup_cubierta%5Bmin%5D=&sup_cubierta%5Bmax%5D=&sup_total%5Bmin%5D=&sup_total%5Bmax%5D=&recientes=mes"
-
-                logger.info(f"Navegando a URL con Playwright: {url}")
+            # Se reutiliza el navegador del proceso; cada búsqueda abre una página propia
+            async with browser_pool.page() as page:
+                url = self._build_url(request)
+
+                logger.info("Navegando a URL con Playwright: %s", url)
 
                 # Aumentar el timeout a 60 segundos y agregar logs para debug
-                logger.info("Iniciando navegación a inmoup.com.ar con Playwright")
+                logger.debug("Iniciando navegación a inmoup.com.ar con Playwright")
                 try:
                     # Reducir el timeout a 30 segundos para evitar bloqueos innecesariamente largos
                     await page.goto(
                         url,
                         timeout=30000,  # Reducido de 60000 a 30000 ms (30 segundos)
-                        wait_until="domcontentloaded"  # Evento que permite cargar antes sin esperar recursos completos
+                        wait_until="commit"  # Volver apenas llega la respuesta; luego se espera solo lo necesario
                     )
-                    logger.info("Página cargada correctamente")
+                    logger.debug("Página cargada correctamente")
                 except Exception as e:
-                    logger.error(f"Error durante la navegación con Playwright: {str(e)}")
+                    logger.error("Error durante la navegación con Playwright: %s", e)
                     # Mostrar un error más amigable al usuario
                     raise HTTPException(
                         status_code=503,
                         detail="No se pudo acceder a inmoup.com.ar. El sitio podría estar caído o bloqueando peticiones automatizadas."
                     )
 
-                logger.info("Página cargada, buscando artículos de propiedades")
-                elements = await page.query_selector_all('article')
+                # Esperar justo hasta que haya datos: window.rdb_properties (camino rápido) o, si la
+                # página terminó de parsearse sin él, los artículos del HTML
+                try:
+                    await page.wait_for_function(_DATA_READY_JS, timeout=15000)
+                except PlaywrightTimeoutError:
+                    logger.warning("No aparecieron propiedades en la página de Inmoup")
+
+                logger.debug("Página cargada, buscando artículos de propiedades")
                 buildings = []
+                from_json = False
+
+                # El JSON de propiedades (que a veces se incluye en el HTML) y los artículos se
+                # leen a la vez, así el respaldo por HTML no espera una ida y vuelta más.
+                # Los artículos se leen en una sola llamada al navegador en lugar de una ida y
+                # vuelta por cada atributo de cada artículo
+                raw_properties, articles_data = await asyncio.gather(
+                    page.evaluate(_RDB_PROPERTIES_JS),
+                    page.locator(_SEL_ARTICLE).evaluate_all(_EXTRACT_ARTICLES_JS),
+                    return_exceptions=True,
+                )
 
-                # También intentamos extraer el JSON de propiedades que a veces se incluye en el HTML
                 try:
-                    # Evaluar script para extraer datos JSON de la página
-                    properties_data = await page.evaluate("""() => {
-                        if (window.rdb_properties && Array.isArray(window.rdb_properties)) {
-                            return window.rdb_properties;
-                        }
-                        return null;
-                    }""")
-
-                    if properties_data:
-                        logger.info(f"Se encontraron {len(properties_data)} propiedades en JSON")
-                        for prop in properties_data:
-                            try:
-                                # Procesamos la imagen principal para asegurarnos de que sea una URL absoluta
-                                main_image = self._fix_image_url(prop.get('foto_portada', ''))
-
-                                buildings.append({
-                                    "price": prop.get('precio', ''),
-                                    "direccion": f"{prop.get('calle', '')}, {prop.get('localidad', '')}",
-                                    "image": main_image,
-                                    "additional_images": [],  # Array vacío en lugar de procesar imágenes adicionales
-                                    "habitaciones": str(prop.get('cant_habitaciones', '')),
-                                    "supTotal": str(prop.get('sup_total', '')),
-                                    "supCub": str(prop.get('sup_cubierta', '')),
-                                    "garage": bool(prop.get('garage', False)),
-                                    "banos": str(prop.get('cant_banos', '')),
-                                    "url": f"https://inmoup.com.ar{prop.get('url', '')}",
-                                    "kid": str(prop.get('id', '')),
-                                    "hasgeolocation": "true" if prop.get('lat') and prop.get('lng') else "false",
-                                    "latitude": str(prop.get('lat', '')),
-                                    "longitude": str(prop.get('lng', '')),
-                                    "source": "inmoup"
-                                })
-                            except Exception as e:
-                                logger.error(f"Error procesando propiedad JSON: {str(e)}")
+                    if isinstance(raw_properties, Exception):
+                        raise raw_properties
+                    # El navegador devuelve el JSON como texto y se decodifica con orjson, más
+                    # rápido que dejar que Playwright deserialice el arreglo objeto por objeto
+                    properties_data = orjson.loads(raw_properties) if raw_properties else None
+
+                    # Un arreglo vacío es un resultado válido: la búsqueda no tiene propiedades
+                    if isinstance(properties_data, list):
+                        logger.info("Se encontraron %s propiedades en JSON", len(properties_data))
+                        buildings = self._props_to_buildings(properties_data)
+                        from_json = True
                 except Exception as e:
-                    logger.error(f"Error extrayendo JSON de propiedades: {str(e)}")
-
-                # Si no pudimos extraer propiedades del JSON, extraer del HTML
-                if not buildings:
-                    logger.info(f"Se encontraron {len(elements)} propiedades con Playwright")
-                    for element in elements:
-                        try:
-                            price = await element.get_attribute('precio') or ""
-                            kid = await element.get_attribute('kid') or ""
-                            lat = await element.get_attribute('lat') or ""
-                            lng = await element.get_attribute('lng') or ""
-                            hasgeolocation = await element.get_attribute('hasgeolocation') or ""
-                            sup_total = await element.get_attribute('sup_t') or ""
-                            sup_cub = await element.get_attribute('sup_c') or ""
-                            habitaciones = await element.get_attribute('ser_1') or ""
-                            banos = await element.get_attribute('ser_2') or ""
-                            garage = await element.get_attribute('ser_3') or ""
-
-                            direccion_elem = await element.query_selector('div.property-data')
-                            direccion = await direccion_elem.inner_text() if direccion_elem else ""
-                            direccion = direccion.replace('\n\n', ', ')
-
-                            # Obtener la imagen principal y convertirla a URL absoluta
-                            img_elem = await element.query_selector('img')
-                            image_rel = await img_elem.get_attribute('src') if img_elem else ""
-                            image = self._fix_image_url(image_rel)
-
-                            url_elem = await element.query_selector('a.cont-photo')
-                            url = f"https://inmoup.com.ar{await url_elem.get_attribute('href') if url_elem else ''}"
-
-                            buildings.append({
-                                "price": price,
-                                "direccion": direccion,
-                                "image": image,
-                                "additional_images": [],  # Array vacío en lugar de procesar imágenes adicionales
-                                "habitaciones": habitaciones,
-                                "supTotal": sup_total,
-                                "supCub": sup_cub,
-                                "garage": garage,
-                                "banos": banos,
-                                "url": url,
-                                "kid": kid,
-                                "hasgeolocation": hasgeolocation,
-                                "latitude": lat,
-                                "longitude": lng,
-                                "source": "inmoup"
-                            })
-                        except Exception as e:
-                            logger.error(f"Error procesando propiedad: {str(e)}")
-                            # Continuamos con la siguiente propiedad si hay un error
-
-                await browser.close()
+                    logger.error("Error extrayendo JSON de propiedades: %s", e)
+
+                # Si no pudimos extraer propiedades del JSON, usar las del HTML
+                if not from_json:
+                    if isinstance(articles_data, Exception):
+                        raise articles_data
+                    logger.info("Se encontraron %s propiedades con Playwright", len(articles_data))
+                    # El script garantiza todas las claves, así que la lista se arma de una vez
+                    buildings = [
+                        InmoupBuilding(
+                            price=article["precio"],
+                            direccion=article["direccion"],
+                            image=article["image"],
+                            additional_images=(),  # Sin imágenes adicionales
+                            habitaciones=article["ser_1"],
+                            supTotal=article["sup_t"],
+                            supCub=article["sup_c"],
+                            garage=article["ser_3"],
+                            banos=article["ser_2"],
+                            url=urljoin(_BASE_URL, article['href']),
+                            kid=article["kid"],
+                            hasgeolocation=article["hasgeolocation"],
+                            latitude=article["lat"],
+                            longitude=article["lng"],
+                        )
+                        for article in articles_data
+                    ]
+
+                if buildings:
+                    await browser_pool.save_storage_state()
                 return buildings
         except Exception as e:
-            logger.error(f"Error general en el scraper de Inmoup con Playwright: {str(e)}")
+            logger.error("Error general en el scraper de Inmoup con Playwright: %s", e)
             raise HTTPException(
                 status_code=500,
                 detail="Error interno del servidor al procesar datos de inmuebles de Inmoup"
             )
 
 # Función auxiliar para mantener compatibilidad con el código existente
-async def get_buildings_inmoup(request=None):
+async def get_buildings_inmoup(request=None) -> List[Dict[str, Any]]:
     """
-    Función de compatibilidad que instancia InmoupScraper y llama a su método get_buildings
+    Función de compatibilidad que instancia InmoupScraper y llama a su método get_buildings.
+    Devuelve dicts, como antes de que las filas fueran dataclasses
     """
     scraper = InmoupScraper()
-    return await scraper.get_buildings(request)
+    return [asdict(building) for building in await scraper.get_buildings(request)]
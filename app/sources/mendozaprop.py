@@ -1,11 +1,22 @@
 import logging
-import json
 import asyncio
+from dataclasses import asdict, dataclass
+import os
+import random
+import re
+import unicodedata
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import orjson
 import aiohttp
 import ssl
+import time
 import certifi
+from cachetools import TTLCache
+from contextlib import asynccontextmanager
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from urllib.parse import urljoin
+from typing import ClassVar, List, Dict, Any, Optional
 from fastapi import HTTPException
 from .base_scraper import BaseScraper
 
@@ -13,15 +24,291 @@ from .base_scraper import BaseScraper
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Archivo donde persiste la caché de geocodificación entre reinicios
+GEOCODE_CACHE_PATH = os.path.expanduser(
+    os.getenv("GEOCODE_CACHE_PATH", os.path.join("~", ".cache", "mapea", "geocode.json"))
+)
+# Espera antes de escribir la caché, para agrupar en una escritura las direcciones nuevas de una búsqueda
+GEOCODE_CACHE_SAVE_DELAY = 5.0
+# Nominatim admite una solicitud por segundo: cada búsqueda pide como mucho GEOCODE_SEARCH_BUDGET
+# direcciones nuevas y las espera GEOCODE_SEARCH_TIMEOUT segundos en total. Las que no llegan a
+# tiempo terminan en segundo plano y completan la caché; el resto se devuelve sin coordenadas
+# (se geocodificarán en próximas búsquedas)
+GEOCODE_SEARCH_BUDGET = int(os.getenv("GEOCODE_SEARCH_BUDGET", "5"))
+GEOCODE_SEARCH_TIMEOUT = float(os.getenv("GEOCODE_SEARCH_TIMEOUT", "8"))
+
+class _GeocodeBudget:
+    """
+    Geocodificaciones que una búsqueda todavía puede esperar, y hasta cuándo
+    """
+    __slots__ = ("remaining", "deadline")
+
+    def __init__(self):
+        self.remaining = GEOCODE_SEARCH_BUDGET
+        self.deadline = time.monotonic() + GEOCODE_SEARCH_TIMEOUT
+
+    def take(self) -> bool:
+        if self.remaining <= 0 or time.monotonic() >= self.deadline:
+            return False
+        self.remaining -= 1
+        return True
+
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+def _normalize_address(address: str) -> str:
+    """
+    Clave de caché para una dirección: minúsculas, sin acentos ni puntuación
+    """
+    text = unicodedata.normalize("NFKD", address).encode("ascii", "ignore").decode("ascii").lower()
+    return _NON_ALNUM_RE.sub(" ", text).strip()
+
+def _load_geocode_cache() -> Dict[str, tuple]:
+    try:
+        with open(GEOCODE_CACHE_PATH, "rb") as f:
+            data = orjson.loads(f.read())
+        return {key: tuple(value) for key, value in data.items()}
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning("No se pudo leer la caché de geocodificación: %s", e)
+        return {}
+
+def _write_geocode_cache(cache: Dict[str, tuple]) -> None:
+    # Escritura atómica: un lector nunca ve el archivo a medio escribir
+    os.makedirs(os.path.dirname(GEOCODE_CACHE_PATH), exist_ok=True)
+    tmp_path = f"{GEOCODE_CACHE_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(cache))
+    os.replace(tmp_path, GEOCODE_CACHE_PATH)
+
+async def _read_json(response: aiohttp.ClientResponse) -> Any:
+    """
+    Decodifica el cuerpo JSON de la respuesta con orjson, más rápido que response.json()
+    """
+    return orjson.loads(await response.read())
+
+# Base para convertir en absolutas las rutas relativas de imágenes
+_SITE_URL = "https://www.mendozaprop.com/"
+
+# Bytes del cuerpo de una respuesta de error que se incluyen en el log
+_ERROR_BODY_PREVIEW_BYTES = 2048
+
+# Reintentos de páginas de la API ante errores transitorios, con espera exponencial y jitter
+_PAGE_FETCH_ATTEMPTS = 4
+_RETRY_BASE_DELAY = 0.5
+_RETRY_MAX_DELAY = 8.0
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Estados que indican saturación de la API: reducen a la mitad las páginas en paralelo
+_THROTTLE_STATUSES = frozenset({429, 503})
+# Páginas pedidas a la vez como máximo, y respuestas exitosas seguidas para subir una más
+_MAX_PAGE_CONCURRENCY = 5
+_PAGE_CONCURRENCY_RECOVERY = 10
+
+def _retry_delay(attempt: int) -> float:
+    return min(_RETRY_MAX_DELAY, _RETRY_BASE_DELAY * 2 ** attempt) + random.uniform(0, _RETRY_BASE_DELAY)
+
+# Solicitudes restantes (según X-RateLimit-Remaining) por debajo de las cuales se hace una pausa,
+# y pausa por defecto si la API no indica Retry-After
+_RATE_LIMIT_LOW_REMAINING = 1
+_RATE_LIMIT_DEFAULT_PAUSE = 1.0
+
+def _retry_after_seconds(headers) -> Optional[float]:
+    """
+    Segundos indicados por la cabecera Retry-After (en segundos o como fecha HTTP), o None
+    """
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def _rate_limit_remaining(headers) -> Optional[int]:
+    try:
+        return int(headers.get("X-RateLimit-Remaining", ""))
+    except ValueError:
+        return None
+
+async def _read_api_response(response: aiohttp.ClientResponse) -> Any:
+    """
+    Devuelve el JSON de una respuesta de la API de MendozaProp, o lanza HTTPException 503
+    si el estado no es 200. Del cuerpo de error solo se leen los primeros bytes para el log
+    """
+    if response.status != 200:
+        preview = (await response.content.read(_ERROR_BODY_PREVIEW_BYTES)).decode("utf-8", "replace")
+        logger.error("Error en la API de MendozaProp: %s - %s", response.status, preview)
+        raise HTTPException(
+            status_code=503,
+            detail=f"No se pudo acceder a la API de MendozaProp. Código de estado: {response.status}"
+        )
+    return await _read_json(response)
+
+# Rutas donde la API puede traer cada dato, en orden de preferencia
+_LAT_PATHS = (("latitude",), ("google_lat",), ("map", "latitude"), ("coords", "lat"), ("location", "latitude"), ("location", "lat"))
+_LNG_PATHS = (("longitude",), ("google_lng",), ("map", "longitude"), ("coords", "lng"), ("location", "longitude"), ("location", "lng"))
+_IMAGE_PATHS = (("images",), ("photos",), ("gallery",), ("media", "images"))
+
+def _dig(data: Any, path: tuple) -> Any:
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+def _first_value(data: Dict, paths: tuple) -> Any:
+    """
+    Devuelve el primer valor no vacío entre las rutas dadas, o cadena vacía
+    """
+    for path in paths:
+        value = _dig(data, path)
+        if value:
+            return value
+    return ""
+
+def _find_latlon(prop: Dict) -> tuple:
+    """
+    Coordenadas de una propiedad: primero los campos de primer nivel, que es lo habitual, y
+    solo si faltan se recorren las rutas anidadas
+    """
+    latitude = prop.get("latitude") or prop.get("google_lat")
+    longitude = prop.get("longitude") or prop.get("google_lng")
+    if latitude and longitude:
+        return latitude, longitude
+    return _first_value(prop, _LAT_PATHS), _first_value(prop, _LNG_PATHS)
+
+def _image_object_url(img: Dict) -> str:
+    return img.get("url") or img.get("src") or img.get("path") or ""
+
+# Tipo de operación (1 = alquiler)
+_OPERATION_TYPE = "1"
+# Tipos de propiedades de la API, ya codificados para la URL
+_DEFAULT_PROPERTY_TYPES = "40%2C3%2C45%2C46%2C5%2C1119%2C1154%2C1118%2C1117%2C1144%2C1145%2C4%2C7%2C1107%2C1106%2C1108%2C1140"
+_DEPARTMENT_TYPES = "3"
+_HOUSE_TYPES = "1"
+# Regiones por defecto
+_DEFAULT_REGION = "guaymallen%2Cmendoza%2Cgodoycruz"
+# Conversión de ciudades al formato de región esperado por MendozaProp
+_CITY_MAP = {
+    "mendoza": "mendoza",
+    "godoycruz": "godoycruz",
+    "guaymallen": "guaymallen",
+    "lasheras": "lasheras",
+    "lujandecuyo": "lujandecuyo",
+    "maipu": "maipu",
+    "sanrafael": "sanrafael",
+    "sanmartin": "sanmartin",
+    "tunuyan": "tunuyan",
+    "junin": "junin",
+    "lavalle": "lavalle",
+    "tupungato": "tupungato",
+    "sancarlos": "sancarlos",
+    "generalalvear": "generalalvear",
+    "santarosa": "santarosa",
+    "rivadavia": "rivadavia",
+    "malargue": "malargue",
+    "lapaz": "lapaz"
+}
+
+@dataclass(slots=True)
+class MendozaPropBuilding:
+    """
+    Propiedad obtenida de MendozaProp. Con slots ocupa menos memoria que un dict por fila y
+    orjson la serializa directamente
+    """
+    id: str
+    price: str
+    direccion: str
+    image: str
+    additional_images: List[str]
+    habitaciones: str
+    supTotal: str
+    supCub: str
+    banos: str
+    garage: bool
+    url: str
+    latitude: str
+    longitude: str
+    hasgeolocation: bool
+    description: str
+    source: str = "mendozaprop"
+
 class MendozaPropScraper(BaseScraper):
     """
     Scraper específico para el sitio MendozaProp que utiliza su API REST
     """
 
+    row_type = MendozaPropBuilding
+
+    # Sesión aiohttp compartida entre búsquedas para reutilizar las conexiones keep-alive
+    # con mendozaprop.com y nominatim.openstreetmap.org
+    _session: ClassVar[Optional[aiohttp.ClientSession]] = None
+    _session_lock: ClassVar[asyncio.Lock] = asyncio.Lock()
+
+    # La política de uso de Nominatim admite como mucho una solicitud por segundo por aplicación
+    _geocode_lock: ClassVar[asyncio.Lock] = asyncio.Lock()
+    _last_geocode_at: ClassVar[float] = 0.0
+    GEOCODE_MIN_INTERVAL: ClassVar[float] = 1.1
+
     def __init__(self):
-        self.geocode_cache = {}  # Caché de geocodificación para evitar solicitudes repetidas
+        # Caché de geocodificación para evitar solicitudes repetidas, por dirección normalizada
+        # y persistida en disco
+        self.geocode_cache = _load_geocode_cache()
+        self._geocode_save_task: Optional[asyncio.Task] = None
+        # Direcciones que Nominatim no pudo resolver hace poco: no se vuelven a consultar en una hora
+        self._geocode_misses: TTLCache = TTLCache(maxsize=4096, ttl=3600)
+        # Geocodificaciones en curso, por dirección normalizada: quien pide la misma dirección
+        # mientras tanto espera el mismo resultado en vez de repetir la solicitud
+        self._geocode_inflight: Dict[str, asyncio.Future] = {}
+        # Límite de propiedades procesándose a la vez
+        self._process_semaphore = asyncio.Semaphore(16)
+        # Páginas de la API en paralelo, ajustadas según las respuestas: se reducen a la mitad
+        # cuando la API está saturada y suben de a una tras varias respuestas exitosas
+        self._page_concurrency = _MAX_PAGE_CONCURRENCY
+        self._pages_in_flight = 0
+        self._page_successes = 0
+        self._page_slots = asyncio.Condition()
+        # Momento (time.monotonic) antes del cual no se piden páginas, según las cabeceras de límite
+        self._api_resume_at = 0.0
+
+    @classmethod
+    async def session(cls) -> aiohttp.ClientSession:
+        """
+        Devuelve la sesión HTTP compartida, creándola en el primer uso
 
-    async def get_buildings(self, request: BaseModel) -> List[Dict[str, Any]]:
+        Returns:
+            Instancia compartida de aiohttp.ClientSession
+        """
+        if cls._session is None or cls._session.closed:
+            async with cls._session_lock:
+                if cls._session is None or cls._session.closed:
+                    # Configurar SSL para macOS
+                    # Utilizamos los certificados del sistema operativo mediante certifi
+                    ssl_context = ssl.create_default_context(cafile=certifi.where())
+                    conn = aiohttp.TCPConnector(
+                        ssl=ssl_context,
+                        limit=100,
+                        limit_per_host=16,
+                        ttl_dns_cache=300,
+                        keepalive_timeout=75,
+                    )
+                    cls._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=60), connector=conn)
+        return cls._session
+
+    @classmethod
+    async def close_session(cls) -> None:
+        """
+        Cierra la sesión HTTP compartida (al apagar la aplicación)
+        """
+        if cls._session is not None:
+            await cls._session.close()
+            cls._session = None
+
+    async def get_buildings(self, request: BaseModel) -> List[MendozaPropBuilding]:
         """
         Implementación optimizada del método para obtener propiedades de MendozaProp mediante su API
 
@@ -32,160 +319,79 @@ class MendozaPropScraper(BaseScraper):
             Lista de propiedades encontradas
         """
         try:
-            buildings = []
-            offset = 0
             limit = 50  # Aumentamos el límite para reducir número de páginas
-            more_properties = True
             max_pages = 5  # Reducimos a 5 páginas (250 propiedades) para mejorar rendimiento
             page_count = 0
 
-            # Determinar tipo de operación (1 = alquiler)
-            operation_type = "1"
-
             # Tipos de propiedades (por defecto todos los tipos para alquiler)
-            property_type = "40%2C3%2C45%2C46%2C5%2C1119%2C1154%2C1118%2C1117%2C1144%2C1145%2C4%2C7%2C1107%2C1106%2C1108%2C1140"
-
+            property_type = _DEFAULT_PROPERTY_TYPES
             if request and request.property_type:
                 # Ajustamos el tipo de propiedad si está especificado
-                if "depart" in request.property_type.lower():
+                requested_type = request.property_type.lower()
+                if "depart" in requested_type:
                     # Filtrar solo departamentos
-                    property_type = "3"
-                elif "casa" in request.property_type.lower():
+                    property_type = _DEPARTMENT_TYPES
+                elif "casa" in requested_type:
                     # Filtrar solo casas
-                    property_type = "1"
+                    property_type = _HOUSE_TYPES
 
             # Determinar regiones basadas en las ciudades proporcionadas
-            region = "guaymallen%2Cmendoza%2Cgodoycruz"  # Por defecto
-
-            if request and request.cities and len(request.cities) > 0:
-                # Convertir ciudades a formato de región esperado por MendozaProp
-                city_map = {
-                    "mendoza": "mendoza",
-                    "godoycruz": "godoycruz",
-                    "guaymallen": "guaymallen",
-                    "lasheras": "lasheras",
-                    "lujandecuyo": "lujandecuyo",
-                    "maipu": "maipu",
-                    "sanrafael": "sanrafael",
-                    "sanmartin": "sanmartin",
-                    "tunuyan": "tunuyan",
-                    "junin": "junin",
-                    "lavalle": "lavalle",
-                    "tupungato": "tupungato",
-                    "sancarlos": "sancarlos",
-                    "generalalvear": "generalalvear",
-                    "santarosa": "santarosa",
-                    "rivadavia": "rivadavia",
-                    "malargue": "malargue",
-                    "lapaz": "lapaz"
-                }
-
-                regions = []
-                for city in request.cities:
-                    city_lower = city.lower()
-                    if city_lower in city_map:
-                        regions.append(city_map[city_lower])
-                    else:
-                        # Si no encontramos la conversión, usamos el valor tal cual
-                        regions.append(city_lower)
-
-                if regions:
-                    region = "%2C".join(regions)
-
-            total_properties = 0
-            properties_data = []
-
-            # Configurar SSL para macOS
-            # Utilizamos los certificados del sistema operativo mediante certifi
-            ssl_context = ssl.create_default_context(cafile=certifi.where())
+            region = _DEFAULT_REGION
+            if request and request.cities:
+                # Convertir ciudades a formato de región esperado por MendozaProp; si no
+                # encontramos la conversión, usamos el valor tal cual
+                region = "%2C".join(_CITY_MAP.get(city.lower(), city.lower()) for city in request.cities)
+
+            # Sesión compartida: evita un handshake TCP+TLS nuevo en cada búsqueda
+            session = await self.session()
+
+            # Se piden todas las páginas a la vez (la API pagina por offset/limit) y se consumen
+            # en orden hasta la primera incompleta; las propiedades de cada página se procesan
+            # apenas llega, mientras se siguen descargando las demás
+            base_url = f"https://www.mendozaprop.com/api/properties?limit={limit}&isMap=true&operationType={_OPERATION_TYPE}&propertyType={property_type}&region={region}"
+            page_tasks = [
+                asyncio.ensure_future(self._fetch_page(session, f"{base_url}&offset={limit * i}", i + 1))
+                for i in range(max_pages)
+            ]
+            process_tasks = []
+            geocode_budget = _GeocodeBudget()
 
-            # Usamos aiohttp.ClientSession para mejorar la eficiencia de las conexiones HTTP
-            # Configuramos el contexto SSL personalizado
-            conn = aiohttp.TCPConnector(ssl=ssl_context)
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=60), connector=conn) as session:
-                # Loop para obtener todas las propiedades con paginación
-                while more_properties and page_count < max_pages:
+            try:
+                for page_task in page_tasks:
                     page_count += 1
-                    # Construir URL de API con los parámetros adecuados y solicitar datos con geolocalización
-                    api_url = f"https://www.mendozaprop.com/api/properties?limit={limit}&offset={offset}&isMap=true&operationType={operation_type}&propertyType={property_type}&region={region}"
-
-                    logger.info(f"Consultando API MendozaProp (Página {page_count}): {api_url}")
-
-                    try:
-                        async with session.get(api_url, timeout=15) as response:
-                            if response.status != 200:
-                                logger.error(f"Error en la API de MendozaProp: {response.status} - {await response.text()}")
-                                raise HTTPException(
-                                    status_code=503,
-                                    detail=f"No se pudo acceder a la API de MendozaProp. Código de estado: {response.status}"
-                                )
-
-                            data = await response.json()
-                            logger.info(f"Recibida respuesta de la API de MendozaProp (página {page_count})")
-                    except asyncio.TimeoutError:
-                        logger.error(f"Timeout al consultar la API de MendozaProp para la página {page_count}")
+                    properties = await page_task
+                    if properties is None:
+                        # Timeout en esta página: nos quedamos con lo obtenido hasta acá
                         break
-                    except Exception as e:
-                        logger.error(f"Error al conectar con MendozaProp: {str(e)}")
-                        # En caso de error, probamos con verificación SSL deshabilitada (solo para desarrollo)
-                        try:
-                            logger.warning("Reintentando con verificación SSL deshabilitada (solo para desarrollo)")
-                            # Crear un conector sin verificación SSL (para desarrollo)
-                            unsafe_connector = aiohttp.TCPConnector(ssl=False)
-                            async with aiohttp.ClientSession(connector=unsafe_connector) as unsafe_session:
-                                async with unsafe_session.get(api_url, timeout=15) as response:
-                                    if response.status != 200:
-                                        logger.error(f"Error en la API de MendozaProp: {response.status} - {await response.text()}")
-                                        raise HTTPException(
-                                            status_code=503,
-                                            detail=f"No se pudo acceder a la API de MendozaProp. Código de estado: {response.status}"
-                                        )
-
-                                    data = await response.json()
-                                    logger.info(f"Recibida respuesta de la API de MendozaProp (página {page_count}) con verificación SSL deshabilitada")
-                        except Exception as inner_e:
-                            logger.error(f"Error persistente al conectar con MendozaProp incluso sin verificación SSL: {str(inner_e)}")
-                            raise HTTPException(
-                                status_code=503,
-                                detail=f"No se pudo conectar con MendozaProp: {str(inner_e)}"
-                            )
-
-                    # La respuesta es directamente una lista de propiedades
-                    properties = data if isinstance(data, list) else []
 
                     if not properties:
                         logger.info("No se encontraron más propiedades")
-                        more_properties = False
                         break
 
                     logger.info(f"Se encontraron {len(properties)} propiedades en la página {page_count}")
-                    properties_data.extend(properties)
-
-                    # Incrementar offset para la siguiente página
-                    offset += len(properties)
+                    process_tasks.extend(
+                        asyncio.ensure_future(self._process_property_limited(prop, session, geocode_budget))
+                        for prop in properties
+                    )
 
                     # Si recibimos menos propiedades que el límite, hemos llegado al final
                     if len(properties) < limit:
                         logger.info(f"Recibidas menos propiedades ({len(properties)}) que el límite ({limit}). No hay más páginas.")
-                        more_properties = False
-
-                if page_count >= max_pages:
+                        break
+                else:
                     logger.info(f"Se alcanzó el límite máximo de {max_pages} páginas")
 
-                # Procesar todas las propiedades en paralelo
-                # Creamos tareas asíncronas para procesar cada propiedad
-                tasks = []
-                for prop in properties_data:
-                    tasks.append(self._process_property(prop, session))
-
-                # Ejecutamos todas las tareas en paralelo y esperamos los resultados
-                processed_properties = await asyncio.gather(*tasks, return_exceptions=True)
+                # Las propiedades que fallan devuelven None y se descartan
+                processed_properties = await asyncio.gather(*process_tasks)
+            finally:
+                # Páginas posteriores a la última útil, o todo lo pendiente si hubo un error
+                pending = (*page_tasks, *process_tasks)
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
 
-                # Filtramos los resultados exitosos (no excepciones)
-                for result in processed_properties:
-                    if isinstance(result, dict):  # Sólo añadir resultados válidos (no excepciones)
-                        buildings.append(result)
-                        total_properties += 1
+            buildings = [result for result in processed_properties if result is not None]
+            total_properties = len(buildings)
 
             logger.info(f"Total: Se procesaron {total_properties} propiedades en MendozaProp entre {page_count} páginas")
             return buildings
@@ -197,16 +403,121 @@ class MendozaPropScraper(BaseScraper):
                 detail=f"Error interno del servidor al procesar datos de inmuebles de MendozaProp: {str(e)}"
             )
 
-    async def _process_property(self, prop: Dict, session: aiohttp.ClientSession) -> Dict[str, Any]:
+    async def _fetch_page(self, session: aiohttp.ClientSession, api_url: str, page_number: int) -> Optional[List[Dict]]:
+        """
+        Descarga una página de la API de MendozaProp
+
+        Args:
+            session: Sesión HTTP asincrona
+            api_url: URL de la página (con su offset)
+            page_number: Número de página, para los logs
+
+        Returns:
+            Lista de propiedades de la página, o None si hubo timeout
+        """
+        logger.info("Consultando API MendozaProp (Página %s): %s", page_number, api_url)
+
+        for attempt in range(_PAGE_FETCH_ATTEMPTS):
+            last_attempt = attempt == _PAGE_FETCH_ATTEMPTS - 1
+            retry_after = None
+            try:
+                async with self._page_slot():
+                    async with session.get(api_url, timeout=15) as response:
+                        self._record_page_result(response.status)
+                        retry_after = self._record_rate_limit(response)
+                        if response.status in _RETRY_STATUSES and not last_attempt:
+                            logger.warning("MendozaProp respondió %s (página %s), reintentando", response.status, page_number)
+                        else:
+                            data = await _read_api_response(response)
+                            logger.info("Recibida respuesta de la API de MendozaProp (página %s)", page_number)
+                            break
+            except asyncio.TimeoutError:
+                if last_attempt:
+                    logger.error("Timeout al consultar la API de MendozaProp para la página %s", page_number)
+                    return None
+                logger.warning("Timeout en la página %s de MendozaProp, reintentando", page_number)
+            except aiohttp.ClientError as e:
+                if last_attempt:
+                    logger.error("Error al conectar con MendozaProp: %s", e)
+                    raise HTTPException(
+                        status_code=503,
+                        detail=f"No se pudo conectar con MendozaProp: {str(e)}"
+                    )
+                logger.warning("Error al conectar con MendozaProp (página %s), reintentando: %s", page_number, e)
+            await asyncio.sleep(max(_retry_delay(attempt), retry_after or 0.0))
+
+        # La respuesta es directamente una lista de propiedades
+        return data if isinstance(data, list) else []
+
+    @asynccontextmanager
+    async def _page_slot(self):
+        """
+        Espera un lugar entre las páginas en curso según el límite adaptativo actual
+        """
+        async with self._page_slots:
+            await self._page_slots.wait_for(lambda: self._pages_in_flight < self._page_concurrency)
+            self._pages_in_flight += 1
+        try:
+            wait = self._api_resume_at - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            yield
+        finally:
+            async with self._page_slots:
+                self._pages_in_flight -= 1
+                self._page_slots.notify_all()
+
+    def _record_page_result(self, status: int) -> None:
+        """
+        Ajusta el límite de páginas en paralelo: a la mitad si la API está saturada,
+        una más cada cierta cantidad de respuestas exitosas
+        """
+        if status in _THROTTLE_STATUSES:
+            self._page_concurrency = max(1, self._page_concurrency // 2)
+            self._page_successes = 0
+            logger.info("MendozaProp saturada, páginas en paralelo: %s", self._page_concurrency)
+        elif status == 200:
+            self._page_successes += 1
+            if self._page_successes >= _PAGE_CONCURRENCY_RECOVERY and self._page_concurrency < _MAX_PAGE_CONCURRENCY:
+                self._page_concurrency += 1
+                self._page_successes = 0
+
+    def _record_rate_limit(self, response: aiohttp.ClientResponse) -> Optional[float]:
+        """
+        Lee Retry-After y X-RateLimit-Remaining de una respuesta y, si la API pide esperar o
+        quedan pocas solicitudes, posterga las siguientes páginas
+
+        Returns:
+            Segundos indicados por Retry-After, o None
+        """
+        retry_after = _retry_after_seconds(response.headers)
+        remaining = _rate_limit_remaining(response.headers)
+        if retry_after is None and (remaining is None or remaining > _RATE_LIMIT_LOW_REMAINING):
+            return None
+        pause = retry_after if retry_after is not None else _RATE_LIMIT_DEFAULT_PAUSE
+        self._api_resume_at = max(self._api_resume_at, time.monotonic() + pause)
+        logger.info("Límite de la API de MendozaProp: pausa de %.1f s (restantes: %s)", pause, remaining)
+        return retry_after
+
+    async def _process_property_limited(
+        self, prop: Dict, session: aiohttp.ClientSession, geocode_budget: _GeocodeBudget
+    ) -> Optional[MendozaPropBuilding]:
+        async with self._process_semaphore:
+            return await self._process_property(prop, session, geocode_budget)
+
+    async def _process_property(
+        self, prop: Dict, session: aiohttp.ClientSession, geocode_budget: _GeocodeBudget
+    ) -> Optional[MendozaPropBuilding]:
         """
         Procesa una propiedad individual de forma asíncrona
 
         Args:
             prop: Datos de la propiedad
             session: Sesión HTTP asincrona
+            geocode_budget: Geocodificaciones que la búsqueda todavía puede esperar
 
         Returns:
-            Datos procesados de la propiedad
+            Datos procesados de la propiedad, o None si no se pudo procesar
         """
         try:
             property_id = prop.get("id", "")
@@ -214,89 +525,56 @@ class MendozaPropScraper(BaseScraper):
             # Debug: Registrar la estructura de la propiedad para depuración
             logger.debug(f"Procesando propiedad ID: {property_id}")
 
-            # Extraer datos de coordenadas de diferentes fuentes posibles
-            latitude = self._extract_value(prop, ["latitude", "google_lat"])
-            longitude = self._extract_value(prop, ["longitude", "google_lng"])
-
-            # Buscar en campos anidados
-            if not latitude or not longitude:
-                # Revisar "map" si existe
-                map_data = prop.get("map", {})
-                if isinstance(map_data, dict):
-                    latitude = latitude or map_data.get("latitude", "")
-                    longitude = longitude or map_data.get("longitude", "")
-
-                # Revisar "coords" si existe
-                coords = prop.get("coords", {})
-                if isinstance(coords, dict):
-                    latitude = latitude or coords.get("lat", "")
-                    longitude = longitude or coords.get("lng", "")
-
-                # Revisar "location" si existe
-                location = prop.get("location", {})
-                if isinstance(location, dict):
-                    latitude = latitude or location.get("latitude", location.get("lat", ""))
-                    longitude = longitude or location.get("longitude", location.get("lng", ""))
+            # Extraer datos de coordenadas de diferentes fuentes posibles (incluidos campos
+            # anidados en "map", "coords" y "location"): la primera ruta con valor gana
+            latitude, longitude = _find_latlon(prop)
 
             # Si no hay coordenadas y tenemos una dirección, intentamos geocodificar (con caché)
             direccion = prop.get("address", "")
             if direccion and (not latitude or not longitude):
                 # Primero verificamos si ya tenemos esta dirección en caché
-                if direccion in self.geocode_cache:
-                    latitude, longitude = self.geocode_cache[direccion]
-                    logger.info(f"Usando coordenadas en caché para: {direccion}")
-                else:
-                    # Utilizamos geocodificación solo si es necesario
-                    latitude, longitude = await self._geocode_address(direccion, session)
-                    if latitude and longitude:
-                        # Guardar en caché para futuros usos
-                        self.geocode_cache[direccion] = (latitude, longitude)
-
-            # En MendozaProp, las imágenes pueden venir en diferentes formatos
-            # Vamos a probar varias posibilidades para obtener las imágenes
-            main_image = ""
-            additional_images = []
-
-            # Estrategia 1: Field 'images' como lista directa de URLs
-            all_images = prop.get("images", [])
-
-            # Estrategia 2: Field 'photos' o 'gallery' que puede contener las imágenes
-            if not all_images:
-                all_images = prop.get("photos", prop.get("gallery", []))
-
-            # Estrategia 3: Field 'media' que podría contener las imágenes
-            if not all_images:
-                media = prop.get("media", {})
-                if isinstance(media, dict):
-                    all_images = media.get("images", [])
+                cache_key = _normalize_address(direccion)
+                if cache_key in self.geocode_cache:
+                    latitude, longitude = self.geocode_cache[cache_key]
+                    logger.debug(f"Usando coordenadas en caché para: {direccion}")
+                elif cache_key not in self._geocode_misses:
+                    # Utilizamos geocodificación solo si es necesario: se espera una consulta que ya
+                    # esté en curso, y solo se inicia una nueva si queda presupuesto en la búsqueda
+                    geocode = self._geocode_inflight.get(cache_key)
+                    if geocode is None and geocode_budget.take():
+                        geocode = self._geocode_task(direccion, session)
+                    if geocode is not None and time.monotonic() < geocode_budget.deadline:
+                        try:
+                            latitude, longitude = await asyncio.wait_for(
+                                asyncio.shield(geocode), geocode_budget.deadline - time.monotonic()
+                            )
+                        except asyncio.TimeoutError:
+                            logger.debug("Geocodificación de %s sigue en segundo plano", direccion)
 
-            # Estrategia 4: Field 'image' o 'photo' singular que podría ser la imagen principal
+            # En MendozaProp, las imágenes pueden venir en diferentes formatos: una lista en
+            # 'images', 'photos', 'gallery' o 'media.images', y una imagen principal en 'image' o 'photo'
             main_image_direct = prop.get("image", prop.get("photo", ""))
-            if main_image_direct:
-                main_image = main_image_direct
+            main_image = main_image_direct or ""
+            additional_images = []
 
-            # Procesar el array de imágenes según su formato
+            all_images = _first_value(prop, _IMAGE_PATHS)
             if all_images:
                 # Convertir a lista si no lo es
                 if not isinstance(all_images, list):
                     all_images = [all_images]
 
-                # Procesar las imágenes según su tipo
-                processed_images = []
-                for img in all_images:
-                    # Caso 1: La imagen es directamente una URL (string)
-                    if isinstance(img, str):
-                        processed_images.append(img)
-                    # Caso 2: La imagen es un objeto con una URL en 'url', 'src', o 'path'
-                    elif isinstance(img, dict):
-                        img_url = img.get("url", img.get("src", img.get("path", "")))
-                        if img_url:
-                            processed_images.append(img_url)
+                # Cada imagen es una URL (string) o un objeto con la URL en 'url', 'src' o 'path'
+                processed_images = [
+                    url for url in (
+                        img if isinstance(img, str) else _image_object_url(img)
+                        for img in all_images if isinstance(img, (str, dict))
+                    ) if url
+                ]
 
                 # Si encontramos imágenes procesadas, usarlas
                 if processed_images:
                     # Primera imagen como principal (si no tenemos ya una imagen principal)
-                    if not main_image and processed_images:
+                    if not main_image:
                         main_image = processed_images[0]
 
                     # Resto como adicionales (limitamos a 10 para evitar sobrecarga)
@@ -308,72 +586,96 @@ class MendozaPropScraper(BaseScraper):
 
             # Si main_image es un objeto o un array, intentamos extraer la URL
             if isinstance(main_image, dict):
-                main_image = main_image.get("url", main_image.get("src", main_image.get("path", "")))
+                main_image = _image_object_url(main_image)
             elif isinstance(main_image, list) and len(main_image) > 0:
                 main_image = main_image[0] if isinstance(main_image[0], str) else ""
 
-            # Asegurar que additional_images sea una lista de strings
-            if not isinstance(additional_images, list):
-                additional_images = []
+            # Asegurar que las URLs de las imágenes sean absolutas (urljoin deja intactas las que ya lo son)
+            if main_image:
+                main_image = urljoin(_SITE_URL, main_image)
 
-            # Asegurar que las URLs de las imágenes sean absolutas
-            if main_image and not main_image.startswith(('http://', 'https://')):
-                main_image = f"https://www.mendozaprop.com{main_image if main_image.startswith('/') else '/' + main_image}"
-
-            additional_images = [
-                (f"https://www.mendozaprop.com{img if img.startswith('/') else '/' + img}"
-                if not img.startswith(('http://', 'https://')) else img)
-                for img in additional_images if img
-            ]
+            additional_images = [urljoin(_SITE_URL, img) for img in additional_images]
 
             # Registrar info de depuración sobre las imágenes
             logger.debug(f"Propiedad {property_id} - Imagen principal: {main_image}")
             logger.debug(f"Propiedad {property_id} - Imágenes adicionales: {len(additional_images)}")
 
             # Construir objeto de propiedad con validaciones
-            property_data = {
-                "id": str(property_id),
-                "price": f"{prop.get('price', '')} {prop.get('currency_id', '') == 1 and 'USD' or 'ARS'}",
-                "direccion": direccion,
-                "image": main_image,
-                "additional_images": additional_images,
-                "habitaciones": str(prop.get("bedrooms", "")),
-                "supTotal": str(prop.get("m2", "")),
-                "supCub": str(prop.get("m2_covered", "")),
-                "banos": str(prop.get("bathrooms", "")),
-                "garage": bool(prop.get("parking", 0) > 0),
-                "url": f"https://www.mendozaprop.com/alquiler/{property_id}",
-                "latitude": str(latitude),
-                "longitude": str(longitude),
-                "hasgeolocation": bool(latitude and longitude),
-                "description": str(prop.get("description", "")),
-                "source": "mendozaprop"
-            }
+            property_data = MendozaPropBuilding(
+                id=str(property_id),
+                price=f"{prop.get('price', '')} {'USD' if prop.get('currency_id') == 1 else 'ARS'}",
+                direccion=direccion,
+                image=main_image,
+                additional_images=additional_images,
+                habitaciones=str(prop.get("bedrooms", "")),
+                supTotal=str(prop.get("m2", "")),
+                supCub=str(prop.get("m2_covered", "")),
+                banos=str(prop.get("bathrooms", "")),
+                garage=bool(prop.get("parking", 0) > 0),
+                url=f"https://www.mendozaprop.com/alquiler/{property_id}",
+                latitude=str(latitude),
+                longitude=str(longitude),
+                hasgeolocation=bool(latitude and longitude),
+                description=str(prop.get("description", "")),
+            )
 
             return property_data
 
         except Exception as e:
             logger.error(f"Error procesando propiedad {prop.get('id', '')}: {str(e)}")
-            raise e
+            return None
 
-    def _extract_value(self, data: Dict, keys: List[str]) -> str:
+    def _schedule_geocode_cache_save(self) -> None:
         """
-        Extrae un valor de un diccionario probando múltiples claves
+        Programa una escritura de la caché a disco, si no hay ya una pendiente
+        """
+        if self._geocode_save_task is None or self._geocode_save_task.done():
+            self._geocode_save_task = asyncio.create_task(self._save_geocode_cache())
+
+    async def _save_geocode_cache(self) -> None:
+        await asyncio.sleep(GEOCODE_CACHE_SAVE_DELAY)
+        try:
+            await asyncio.to_thread(_write_geocode_cache, dict(self.geocode_cache))
+        except Exception as e:
+            logger.warning("No se pudo guardar la caché de geocodificación: %s", e)
+
+    def _geocode_task(self, address: str, session: aiohttp.ClientSession) -> asyncio.Future:
+        """
+        Devuelve la geocodificación en curso de una dirección (por dirección normalizada) o
+        la inicia. La tarea guarda el resultado en la caché aunque nadie la espere; quien la
+        espere debe hacerlo con asyncio.shield para no cancelarla a los demás
 
         Args:
-            data: Diccionario de datos
-            keys: Lista de claves a probar
+            address: Dirección a geocodificar
+            session: Sesión HTTP asincrona
 
         Returns:
-            El primer valor encontrado o cadena vacía
+            Tarea que resuelve a (latitud, longitud) o ("", "")
         """
-        for key in keys:
-            value = data.get(key, "")
-            if value:
-                return value
-        return ""
-
-    async def _geocode_address(self, address: str, session: aiohttp.ClientSession) -> tuple:
+        cache_key = _normalize_address(address)
+        future = self._geocode_inflight.get(cache_key)
+        if future is None:
+            future = asyncio.ensure_future(self._geocode_and_cache(address, cache_key, session))
+            self._geocode_inflight[cache_key] = future
+            future.add_done_callback(lambda _: self._geocode_inflight.pop(cache_key, None))
+        return future
+
+    async def _geocode_and_cache(self, address: str, cache_key: str, session: aiohttp.ClientSession) -> tuple:
+        result = await self._request_geocode(address, session)
+        if result is None:
+            # Falla transitoria (timeout, 429, 503...): no se recuerda, se reintenta en otra búsqueda
+            return "", ""
+        latitude, longitude = result
+        if latitude and longitude:
+            # Guardar en caché para futuros usos
+            self.geocode_cache[cache_key] = (latitude, longitude)
+            self._schedule_geocode_cache_save()
+        else:
+            # Nominatim respondió sin resultados: la dirección no se vuelve a consultar por un rato
+            self._geocode_misses[cache_key] = True
+        return latitude, longitude
+
+    async def _request_geocode(self, address: str, session: aiohttp.ClientSession) -> Optional[tuple]:
         """
         Geocodifica una dirección usando el servicio de Nominatim
 
@@ -382,36 +684,47 @@ class MendozaPropScraper(BaseScraper):
             session: Sesión HTTP asincrona
 
         Returns:
-            Tupla (latitud, longitud) o ("", "")
+            Tupla (latitud, longitud), ("", "") si Nominatim no encontró la dirección, o None
+            si la solicitud falló
         """
         try:
             # Preparar dirección para búsqueda (añadiendo Mendoza Argentina)
             search_address = f"{address}, Mendoza, Argentina"
 
             # Usar la API de geocodificación de nominatim (OpenStreetMap)
-            geocode_url = f"https://nominatim.openstreetmap.org/search?q={search_address}&format=json&limit=1"
+            geocode_url = "https://nominatim.openstreetmap.org/search"
+            params = {"q": search_address, "format": "json", "limit": "1", "countrycodes": "ar"}
             headers = {
                 'User-Agent': 'MendozaPropScraper/1.0'  # Necesario para usar la API de Nominatim
             }
 
-            # Hacemos solicitud con timeout
-            async with session.get(geocode_url, headers=headers, timeout=5) as response:
-                if response.status == 200:
-                    geocode_data = await response.json()
-                    if geocode_data and len(geocode_data) > 0:
-                        # Extraer coordenadas
-                        location_data = geocode_data[0]
-                        return location_data.get("lat", ""), location_data.get("lon", "")
-
+            # Hacemos solicitud con timeout, respetando el intervalo mínimo entre solicitudes
+            async with MendozaPropScraper._geocode_lock:
+                wait = MendozaPropScraper._last_geocode_at + self.GEOCODE_MIN_INTERVAL - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                MendozaPropScraper._last_geocode_at = time.monotonic()
+
+            async with session.get(geocode_url, params=params, headers=headers, timeout=5) as response:
+                if response.status != 200:
+                    logger.warning("Nominatim respondió %s para %s", response.status, address)
+                    return None
+                geocode_data = await _read_json(response)
+
+            if geocode_data and len(geocode_data) > 0:
+                # Extraer coordenadas
+                location_data = geocode_data[0]
+                return location_data.get("lat", ""), location_data.get("lon", "")
             return "", ""
         except Exception as e:
-            logger.warning(f"Error en geocodificación para {address}: {str(e)}")
-            return "", ""
+            logger.warning("Error en geocodificación para %s: %s", address, e)
+            return None
 
 # Función auxiliar para mantener compatibilidad con el código existente
-async def get_buildings_mendozaprop(request=None):
+async def get_buildings_mendozaprop(request=None) -> List[Dict[str, Any]]:
     """
-    Función de compatibilidad que instancia MendozaPropScraper y llama a su método get_buildings
+    Función de compatibilidad que instancia MendozaPropScraper y llama a su método get_buildings.
+    Devuelve dicts, como antes de que las filas fueran dataclasses
     """
     scraper = MendozaPropScraper()
-    return await scraper.get_buildings(request)
+    return [asdict(building) for building in await scraper.get_buildings(request)]